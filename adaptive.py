@@ -0,0 +1,189 @@
+import numpy as np
+from matplotlib.tri import Triangulation
+
+#Adaptive sampling picks the next point to measure from the data measured so
+#far, such that points are concentrated where the signal changes (ie Coulomb
+#peaks) instead of spread evenly over flat regions.
+#
+#A learner suggests the next setpoint with ask and is given the measured
+#values with tell. All values and setpoints are normalized to the range seen
+#so far, so several measured parameters can be combined by taking the largest
+#loss of any of them.
+
+class Learner1D:
+    """Adaptive sampling of one swept instrument. Each interval between
+    neighbouring points has a loss equal to its length in the (normalized)
+    x-y plane, so intervals where the signal changes quickly have a large loss.
+    The interval with the largest loss is split in half next.
+    """
+    def __init__(self, bounds, npoints=100, lossGoal=None):
+        """
+        Args:
+            bounds: (start, end) of the setpoints
+
+            npoints: (default=100) Maximum number of points to measure
+
+            lossGoal: (Optional) Stop when the largest loss falls below this
+                value, even if fewer than npoints points have been measured.
+                Loss is the length of an interval normalized to the full
+                range, so a lossGoal of .01 means no interval spans more than
+                about 1% of the plot.
+        """
+        self.bounds = bounds
+        self.npoints = npoints
+        self.lossGoal = lossGoal
+        self._x = []
+        self._values = []
+
+    def ask(self):
+        """Returns the setpoint (as a tuple) to measure next"""
+        if len(self._x) < 2:
+            return (self.bounds[len(self._x)],)
+        x, losses = self._losses()
+        worst = np.argmax(losses)
+        return ((x[worst] + x[worst + 1])/2,)
+
+    def tell(self, point, values):
+        """Adds a measured point
+
+        Args:
+            point: Setpoint (as a tuple) that was measured
+
+            values: List of the measured values of each measured parameter
+        """
+        self._x.append(point[0])
+        self._values.append(values)
+
+    def loss(self):
+        """Returns the largest loss of any interval"""
+        if len(self._x) < 2:
+            return np.inf
+        return np.max(self._losses()[1])
+
+    def _losses(self):
+        """Returns sorted setpoints and the loss of each interval between them"""
+        x = np.array(self._x)
+        order = np.argsort(x)
+        x = x[order]
+        values = _normalize(np.array(self._values)[order])
+        width = abs(self.bounds[1] - self.bounds[0]) or 1
+        dx = np.diff(x)/width
+        dy = np.max(np.abs(np.diff(values, axis=0)), axis=1)
+        return x, np.sqrt(dx**2 + dy**2)
+
+class Learner2D:
+    """Adaptive sampling of two swept instruments. The measured points are
+    triangulated, and each triangle has a loss of sqrt(area) times the spread
+    of the (normalized) values at its corners plus areaWeight. Triangles where
+    the signal changes get refined first, while areaWeight makes sure large
+    flat regions are eventually refined too. The centroid of the triangle with
+    the largest loss is measured next.
+    """
+    areaWeight = .1
+
+    def __init__(self, bounds1, bounds2, npoints=400, lossGoal=None):
+        """
+        Args:
+            bounds1: (start, end) of the setpoints of the first instrument
+
+            bounds2: (start, end) of the setpoints of the second instrument
+
+            npoints: (default=400) Maximum number of points to measure
+
+            lossGoal: (Optional) Stop when the largest loss falls below this
+                value (see Learner1D)
+        """
+        self.bounds = (bounds1, bounds2)
+        self.npoints = npoints
+        self.lossGoal = lossGoal
+        self._points = []
+        self._values = []
+
+        #Start with the corners and the center, so the triangulation covers
+        #the full range
+        (x0, x1), (y0, y1) = self.bounds
+        self._initial = [(x0, y0), (x1, y0), (x0, y1), (x1, y1),
+                         ((x0 + x1)/2, (y0 + y1)/2)]
+
+    def ask(self):
+        """Returns the setpoint (as a tuple) to measure next"""
+        if len(self._points) < len(self._initial):
+            return self._initial[len(self._points)]
+        points, triangles, losses = self._losses()
+        corners = points[triangles[np.argmax(losses)]]
+        return tuple(self._denormalize(corners.mean(axis=0)))
+
+    def tell(self, point, values):
+        """Adds a measured point (see Learner1D)"""
+        self._points.append(point)
+        self._values.append(values)
+
+    def loss(self):
+        """Returns the largest loss of any triangle"""
+        if len(self._points) < len(self._initial):
+            return np.inf
+        return np.max(self._losses()[2])
+
+    def _losses(self):
+        """Returns normalized points, triangles of the triangulation and the
+        loss of each triangle"""
+        points = self._normalize(np.array(self._points))
+        triangles = Triangulation(points[:, 0], points[:, 1]).triangles
+        corners = points[triangles]
+        side1 = corners[:, 1] - corners[:, 0]
+        side2 = corners[:, 2] - corners[:, 0]
+        area = np.abs(side1[:, 0]*side2[:, 1] - side1[:, 1]*side2[:, 0])/2
+        values = _normalize(np.array(self._values))[triangles]
+        spread = np.max(values.max(axis=1) - values.min(axis=1), axis=1)
+        return points, triangles, np.sqrt(area)*(spread + self.areaWeight)
+
+    def _normalize(self, points):
+        low = np.array([min(b) for b in self.bounds])
+        width = np.array([abs(b[1] - b[0]) or 1 for b in self.bounds])
+        return (points - low)/width
+
+    def _denormalize(self, points):
+        low = np.array([min(b) for b in self.bounds])
+        width = np.array([abs(b[1] - b[0]) or 1 for b in self.bounds])
+        return points*width + low
+
+def sample(learner, points, sweepNames, measNames):
+    """Generator of the points of an adaptive sweep, used by PlottingThread in
+    place of a scan order. Before each point is yielded its setpoints are
+    written into the setpoint arrays, and the values measured at the previous
+    point are given to the learner. Stops when the learner's npoints have been
+    measured or its lossGoal is reached.
+
+    Yields (point, index, lineEnd) like the scan order of a regular sweep,
+    where point and index are both the number of the point.
+
+    Args:
+        learner: Learner1D or Learner2D
+
+        points: point_dict of the sweep. All arrays have length
+            learner.npoints, and unmeasured points are nan.
+
+        sweepNames: List of names of the swept instruments
+
+        measNames: List of names of the measured instruments
+    """
+    for n in range(learner.npoints):
+        if n > 0:
+            setpoint = tuple(points[name][n - 1] for name in sweepNames)
+            learner.tell(setpoint, [points[name][n - 1] for name in measNames])
+            if learner.lossGoal is not None and learner.loss() <= learner.lossGoal:
+                return
+        setpoint = learner.ask()
+        for name, value in zip(sweepNames, setpoint):
+            points[name][n] = value
+        yield (n,)*len(sweepNames), (n,), False
+
+def _normalize(values):
+    """Scales each column to the range 0 to 1. Failed measurements (nan) count
+    as the middle of the range."""
+    low = np.nanmin(values, axis=0)
+    high = np.nanmax(values, axis=0)
+    width = np.where(high > low, high - low, 1)
+    normalized = (values - low)/width
+    normalized[np.isnan(normalized)] = .5
+    return normalized
@@ -0,0 +1,141 @@
+import sqlite3
+import pickle
+import glob
+import os.path
+import datafile
+import thumbnails
+
+#Catalog is kept next to the data files, in the current folder
+CATALOG_FILE = 'catalog.db'
+
+_SCHEMA = """CREATE TABLE IF NOT EXISTS datasets (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    filename TEXT UNIQUE NOT NULL,
+    mtime REAL NOT NULL,
+    date TEXT,
+    description TEXT,
+    comment TEXT,
+    thumbnail TEXT)"""
+
+def _connect():
+    """Opens (and creates if necessary) the catalog of the current folder. A
+    new connection is made for every call since saving happens in the sweep
+    threads."""
+    conn = sqlite3.connect(CATALOG_FILE, timeout=10)
+    conn.execute(_SCHEMA)
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(datasets)')]
+    if 'thumbnail' not in columns:
+        #Catalog created before thumbnails were cataloged
+        conn.execute('ALTER TABLE datasets ADD COLUMN thumbnail TEXT')
+    return conn
+
+def dataFiles():
+    """Returns all data files in the current folder, including older pickle
+    files"""
+    return sorted(glob.glob('*' + datafile.EXTENSION)) + sorted(glob.glob('*.p'))
+
+def register(filename, savedData):
+    """Adds or updates the entry of a data file. Called whenever a file is
+    saved, so that listing data never has to open the files themselves.
+
+    Args:
+        filename: Name of the file that was written
+
+        savedData: savedData object that was written to the file
+    """
+    header = {'date': savedData.date, 'description': savedData.description,
+              'comment': savedData.comment}
+    conn = _connect()
+    with conn:
+        _update(conn, filename, os.path.getmtime(filename), header)
+    conn.close()
+
+def refresh():
+    """Brings the catalog up to date with the data files in the current folder.
+    Only files which are new or whose modification time changed since they
+    were last cataloged are read, and entries of deleted files are removed.
+    Files that cannot be read (ie truncated by a crash) are skipped.
+    """
+    conn = _connect()
+    known = dict(conn.execute('SELECT filename, mtime FROM datasets'))
+    files = dataFiles()
+    with conn:
+        for filename in files:
+            mtime = os.path.getmtime(filename)
+            if known.get(filename) == mtime:
+                continue
+            try:
+                header = datafile.readHeader(filename)
+            except (EOFError, OSError, ValueError, KeyError, AttributeError,
+                    ImportError, pickle.UnpicklingError) as error:
+                print('Skipping %s, which cannot be read: %r' % (filename, error))
+                continue
+            _update(conn, filename, mtime, header)
+            #Pick up thumbnails made before the file was cataloged
+            thumbnail = thumbnails.thumbnailFile(os.path.splitext(filename)[0])
+            if os.path.isfile(thumbnail):
+                conn.execute('UPDATE datasets SET thumbnail = ? WHERE filename = ?',
+                             (thumbnail, filename))
+        missing = set(known) - set(files)
+        conn.executemany('DELETE FROM datasets WHERE filename = ?',
+                         [(filename,) for filename in missing])
+    conn.close()
+
+def setThumbnail(filename, thumbnail):
+    """Records the thumbnail of a data file, such that listing data does not
+    need to look for (or render) it again.
+
+    Args:
+        filename: Name of the data file
+
+        thumbnail: Name of the thumbnail png file
+    """
+    conn = _connect()
+    with conn:
+        conn.execute('UPDATE datasets SET thumbnail = ? WHERE filename = ?',
+                     (thumbnail, filename))
+    conn.close()
+
+def entries(comment=None):
+    """Returns list of (id, filename, date, description, comment, thumbnail) of
+    every cataloged file, in the order they were added. thumbnail is None if
+    the file has no thumbnail.
+
+    Args:
+        comment: (Optional) Only return entries whose comment contains this
+    """
+    conn = _connect()
+    query = 'SELECT id, filename, date, description, comment, thumbnail FROM datasets'
+    if comment is None:
+        rows = conn.execute(query + ' ORDER BY id').fetchall()
+    else:
+        rows = conn.execute(query + " WHERE instr(comment, ?) > 0 ORDER BY id",
+                            (comment,)).fetchall()
+    conn.close()
+    return rows
+
+def filename(index):
+    """Returns the filename of the entry with the given ID, or None if there is
+    no such entry
+
+    Args:
+        index: ID of the entry, as given by entries
+    """
+    conn = _connect()
+    row = conn.execute('SELECT filename FROM datasets WHERE id = ?',
+                       (index,)).fetchone()
+    conn.close()
+    if row:
+        return row[0]
+    return None
+
+def _update(conn, filename, mtime, header):
+    """Updates the entry of a file, keeping its ID if it already exists"""
+    values = (mtime, header['date'], header['description'],
+              header['comment'] or '', filename)
+    cursor = conn.execute('UPDATE datasets SET mtime = ?, date = ?, '
+                          'description = ?, comment = ? WHERE filename = ?',
+                          values)
+    if cursor.rowcount == 0:
+        conn.execute('INSERT INTO datasets (mtime, date, description, comment, '
+                      'filename) VALUES (?, ?, ?, ?, ?)', values)
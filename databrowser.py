@@ -1,13 +1,12 @@
-import pickle
 import pandas as pd
-import glob
-import os.path
 from IPython.display import Image, HTML 
+import datafile
+import catalog
 
 def listData():
     """Returns a table of all the saved data files in a table with description, 
 	date, and thumbnail. This is HTML rendered in order to display .png
-	pictures"""
+	pictures. The index of each row is its ID used by loadnum."""
     
     #Prevent truncation of long strings. Also necessary for images which have 
 	#long file names, especially including HTML formatting
@@ -20,11 +19,9 @@ def listData():
 
 
 def _load(filename):
-    """Input is the pickled file that was automatically created from measurement
+    """Input is the data file that was automatically created from measurement
 	or use of save function. Returns savedData object"""
-    with open(filename, 'rb') as file:
-        savedData = pickle.load(file)
-        return savedData
+    return datafile.load(filename)
     
 def loadnum(number):
     """Load filename by index of given by listData. Returns savedData object.
@@ -32,18 +29,15 @@ def loadnum(number):
     Args:
         number: index of file to be loaded. Use listData to see indices.
     """
-    datafiles = glob.glob('*.p')
-    data_table = {'Date': [], 'Description': [], 'Comment': []}
-    i = 0
-    for file in datafiles:
-        try:
-            data = _load(file)
-            if i == number:
-                return data
-            i += 1
-        except EOFError:
-            pass
-    return 'Index out of range!'
+    filename = catalog.filename(number)
+    if filename is None:
+        #File may have been added without going through save, so check the
+        #folder once more
+        catalog.refresh()
+        filename = catalog.filename(number)
+    if filename is None:
+        return 'Index out of range!'
+    return _load(filename)
 
 def query(comment):
     """Returns table of all data that contains the input comment
@@ -54,42 +48,36 @@ def query(comment):
     """
     pd.set_option('display.max_colwidth', -1)
     
-    data_df = _dataTable()
-    
-    data_df_queried = data_df.loc[data_df.loc[:,'Comment'].str.contains(comment)]
-    return HTML(data_df_queried.to_html(escape=False))
+    data_df = _dataTable(comment)
+    return HTML(data_df.to_html(escape=False))
 
-def _dataTable():
+def _dataTable(comment=None):
     """Returns Pandas Dataframe that is used to display table in listData or
-    query
-    """
+    query. Uses the catalog of data files (see catalog.py), so only files that
+    changed since the last listing are read and thumbnails are never rendered
+    here.
     
-    #Get all files with .p extension
-    datafiles = glob.glob('*.p')
+    Args:
+        comment: (Optional) Only include data whose comment contains this
+    """
+    catalog.refresh()
     
     data_table = {'Date': [], 'Description': [], 'Comment': [], 'Thumbnail': []}
-    for file in datafiles:
-        try:
-            data = _load(file)
-            data_table['Date'].append(data.date)
-            data_table['Description'].append(data.description)
-            if data.comment:
-                data_table['Comment'].append(data.comment)
-            else:
-                data_table['Comment'].append('')
-            
-            thumbnail_file = './DataThumbnails/' +file[:-1] +'png' 
-            if os.path.isfile(thumbnail_file):
-                #If a picture exists, add as thumbnail using HTML formatting
-                data_table['Thumbnail'].append('<img src="%s" height="50" width="50"/>' % (thumbnail_file,))
-            else:
-                data_table['Thumbnail'].append('')
-                
-        except EOFError:
-            pass
+    index = []
+    for number, file, date, description, data_comment, thumbnail_file in catalog.entries(comment):
+        index.append(number)
+        data_table['Date'].append(date)
+        data_table['Description'].append(description)
+        data_table['Comment'].append(data_comment)
+        
+        if thumbnail_file:
+            #If a picture exists, add as thumbnail using HTML formatting
+            data_table['Thumbnail'].append('<img src="%s" height="50" width="50"/>' % (thumbnail_file,))
+        else:
+            data_table['Thumbnail'].append('')
     
     #Create Pandas DataFrame based off dictionary, then rearrange columns
-    data_df = pd.DataFrame(data = data_table)
+    data_df = pd.DataFrame(data = data_table, index = index)
     data_df = data_df[['Date', 'Description', 'Comment', 'Thumbnail']]
     return data_df
     
@@ -0,0 +1,367 @@
+import json
+import pickle
+import os.path
+from collections.abc import Mapping
+import h5py
+import numpy as np
+import pandas as pd
+import saveClass
+
+#Version of the on-disk layout. Bump if the layout below changes.
+FORMAT_VERSION = 1
+EXTENSION = '.h5'
+#Largest chunk (in bytes) of arrays written while streaming
+CHUNK_BYTES = 65536
+
+#Layout of a data file:
+#   attrs: name, date, description, comment, sweepNames, measNames, adaptive,
+#       complete, journalOffset (only if known)
+#   setpoints/<instrument>: 1D array of setpoints of each swept instrument
+#   data/<instrument>: array of measured data of each measurement instrument
+#   metadata/<instrument>: JSON string of the state of each instrument
+
+def save(savedData, filename):
+    """Saves a savedData object as an HDF5 file. Setpoints, measured data and
+    metadata are stored as separate datasets such that they can be read
+    without any Holoviews objects.
+
+    Args:
+        savedData: savedData object to be saved
+
+        filename: Name of the file to write to
+    """
+    points = savedData.points
+    if isinstance(points, LazyArrays) and _sameFile(points.filename, filename):
+        #Data is already in this file (and may be memory-mapped from it), so
+        #only the description and metadata need to be rewritten
+        with h5py.File(filename, 'a') as f:
+            _writeHeader(f, savedData)
+            _writeMetadata(f, savedData.state)
+        return
+    
+    with h5py.File(filename, 'w') as f:
+        _writeHeader(f, savedData)
+        setpoints = f.create_group('setpoints')
+        for name in savedData.sweepNames:
+            setpoints.create_dataset(name, data=savedData.points[name])
+        data = f.create_group('data')
+        for name in savedData.measNames:
+            data.create_dataset(name, data=savedData.points[name])
+        _writeMetadata(f, savedData.state)
+        f.attrs['complete'] = True
+
+def load(filename, lazy=True):
+    """Loads a data file and returns the associated savedData object. Files
+    pickled by older versions are also supported.
+    
+    By default only the description, setpoints and metadata are read
+    immediately. Each measured array is read the first time it is accessed
+    (see LazyArrays), so opening a large file is fast.
+
+    Args:
+        filename: Name of the file to load. This can also be a file that is
+            still being written by a running sweep (see DataWriter), in
+            which case unmeasured points are nan and metadata is empty.
+        
+        lazy: (default=True) If False, all measured arrays are read into
+            memory immediately.
+    """
+    if not filename.endswith(EXTENSION):
+        with open(filename, 'rb') as file:
+            return pickle.load(file)
+
+    #swmr allows reading files still open for writing, or left open by a crash
+    with h5py.File(filename, 'r', swmr=True) as f:
+        sweepNames = [_str(name) for name in f.attrs['sweepNames']]
+        measNames = [_str(name) for name in f.attrs['measNames']]
+        setpoints = {name: f['setpoints'][name][()] for name in sweepNames}
+        points = LazyArrays(filename, setpoints, measNames)
+        if not lazy:
+            points = {name: np.array(points[name]) for name in points}
+        metadata = _readMetadata(f)
+        data = saveClass.savedData(points, sweepNames, measNames, metadata,
+                                   _str(f.attrs['name']),
+                                   _str(f.attrs['description']),
+                                   bool(f.attrs.get('adaptive', False)))
+        data.date = _str(f.attrs['date'])
+        data.comment = _str(f.attrs['comment']) or None
+        if 'journalOffset' in f.attrs:
+            data.journalOffset = int(f.attrs['journalOffset'])
+    return data
+
+class LazyArrays(Mapping):
+    """Dictionary of the setpoint and measured arrays of a data file, where
+    measured arrays are only read when first accessed. Arrays stored
+    contiguously (as written by save) are memory-mapped, so only the parts
+    actually used are read from disk. Arrays written in chunks while
+    streaming (see DataWriter) are read in full on first access.
+    """
+    def __init__(self, filename, setpoints, measNames):
+        """
+        Args:
+            filename: Name of the data file
+            
+            setpoints: Dictionary of the setpoint arrays, which are read
+                immediately
+            
+            measNames: List of names of the measured arrays in the file
+        """
+        #Arrays can still be read after the working directory changed
+        self.filename = os.path.abspath(filename)
+        self._arrays = dict(setpoints)
+        self._names = list(setpoints) + list(measNames)
+    
+    def __getitem__(self, name):
+        if name not in self._arrays:
+            if name not in self._names:
+                raise KeyError(name)
+            self._arrays[name] = self._read(name)
+        return self._arrays[name]
+    
+    def __iter__(self):
+        return iter(self._names)
+    
+    def __len__(self):
+        return len(self._names)
+    
+    def _read(self, name):
+        """Memory-maps or reads the measured array with the given name"""
+        with h5py.File(self.filename, 'r', swmr=True) as f:
+            dset = f['data'][name]
+            offset = dset.id.get_offset()
+            if dset.chunks is None and offset is not None:
+                return np.memmap(self.filename, mode='r', dtype=dset.dtype,
+                                 shape=dset.shape, offset=offset)
+            return dset[()]
+
+def _sameFile(file1, file2):
+    return os.path.abspath(file1) == os.path.abspath(file2)
+
+def readHeader(filename):
+    """Reads only the basic description of a data file, without any of the
+    data. Returns dictionary with date, description and comment.
+
+    Args:
+        filename: Name of the file to read
+    """
+    if not filename.endswith(EXTENSION):
+        data = load(filename)
+        return {'date': data.date, 'description': data.description,
+                'comment': data.comment}
+
+    with h5py.File(filename, 'r', swmr=True) as f:
+        return {'date': _str(f.attrs['date']),
+                'description': _str(f.attrs['description']),
+                'comment': _str(f.attrs['comment']) or None}
+
+def _writeHeader(f, savedData):
+    """Writes the basic description of the measurement as attributes"""
+    _writeAttrs(f, savedData.name, savedData.date, savedData.description,
+                savedData.comment, savedData.sweepNames, savedData.measNames,
+                savedData.adaptive)
+    #Older pickled data has no journal offset
+    offset = getattr(savedData, 'journalOffset', None)
+    if offset is not None:
+        f.attrs['journalOffset'] = offset
+
+def _writeAttrs(f, name, date, description, comment, sweepNames, measNames,
+                adaptive):
+    f.attrs['formatVersion'] = FORMAT_VERSION
+    f.attrs['name'] = name
+    f.attrs['date'] = date
+    f.attrs['description'] = description
+    f.attrs['comment'] = comment or ''
+    f.attrs['sweepNames'] = [n.encode() for n in sweepNames]
+    f.attrs['measNames'] = [n.encode() for n in measNames]
+    f.attrs['adaptive'] = adaptive
+
+class DataWriter:
+    """Writes data of a running sweep to disk as it is measured, such that a
+    crash only loses the points since the last flush. The file is opened in
+    HDF5 single-writer/multiple-reader mode, so it can be loaded as a partial
+    dataset at any time (see load).
+    
+    Measured points are only recorded by index, and written out in one block
+    every flushPoints points or at the end of every fast-axis line.
+    """
+    flushPoints = 100
+    
+    def __init__(self, name, points, sweepNames, measNames, description,
+                 streamSetpoints=False, order='raster'):
+        """
+        Args:
+            name: Name of the data. The file is saved as name + EXTENSION
+            
+            points: point_dict of the sweep. Measured arrays are read from
+                this dictionary when flushing.
+            
+            sweepNames: List of names of the swept instruments
+            
+            measNames: List of names of the measured instruments
+            
+            description: Short description of the measurement
+            
+            streamSetpoints: (default=False) If True, the setpoints are also
+                written as they are measured instead of once at the start.
+                Used for adaptive sweeps, where the setpoints are only known
+                once the point is measured.
+            
+            order: (default='raster') Scan order of the sweep (see
+                scanorder.py). Arrays are chunked such that the points of
+                a line are in as few chunks as possible.
+        """
+        self.name = name
+        self.filename = name + EXTENSION
+        self.point_dict = points
+        self.measNames = list(measNames)
+        self.order = order
+        self._pending = []
+        
+        self._file = h5py.File(self.filename, 'w', libver='latest')
+        #Only adaptive sweeps stream their setpoints
+        _writeAttrs(self._file, name, name, description, None, sweepNames,
+                    measNames, streamSetpoints)
+        self._file.attrs['complete'] = False
+        setpoints = self._file.create_group('setpoints')
+        data = self._file.create_group('data')
+        #Datasets written on every flush, as (group, name)
+        self._streamed = []
+        for inst in sweepNames:
+            if streamSetpoints:
+                self._createStreamed(setpoints, inst)
+            else:
+                setpoints.create_dataset(inst, data=points[inst])
+        for inst in self.measNames:
+            self._createStreamed(data, inst)
+        #No new datasets or attributes can be created after this
+        self._file.swmr_mode = True
+        self._file.flush()
+    
+    def _createStreamed(self, group, inst):
+        """Creates an empty (nan) dataset that is filled in on every flush"""
+        shape = self.point_dict[inst].shape
+        group.create_dataset(inst, shape=shape, dtype=float,
+                             fillvalue=np.nan, chunks=self._chunks(shape))
+        self._streamed.append((group.name, inst))
+    
+    def _chunks(self, shape):
+        """Returns the chunk shape of a streamed array, at most CHUNK_BYTES"""
+        if len(shape) == 1:
+            return (min(shape[0], self.flushPoints),)
+        #Measured arrays are indexed in reverse order of the swept
+        #instruments, so lines of the fast axis run along the first axis and
+        #lines of columnFirst along the second
+        if self.order in ('raster', 'serpentine'):
+            lineAxis = 0
+        elif self.order == 'columnFirst':
+            lineAxis = 1
+        else:
+            #Lines of the progressive order cover both axes, so use roughly
+            #square chunks of the inner two axes
+            side = int(np.sqrt(CHUNK_BYTES//8))
+            return (min(shape[0], side), min(shape[1], side)) + (1,)*(len(shape)-2)
+        chunks = [1]*len(shape)
+        chunks[lineAxis] = min(shape[lineAxis], CHUNK_BYTES//8)
+        return tuple(chunks)
+    
+    def mark(self, index):
+        """Records that the point at the given index of the measured arrays
+        has been measured
+        
+        Args:
+            index: Tuple index into the measured arrays
+        """
+        self._pending.append(index)
+        if len(self._pending) >= self.flushPoints:
+            self.flush()
+    
+    def lineDone(self):
+        """Flushes the points of a completed fast-axis line"""
+        self.flush()
+    
+    def flush(self):
+        """Writes all pending points to disk"""
+        if not self._pending:
+            return
+        indices = np.array(self._pending)
+        low = indices.min(axis=0)
+        high = indices.max(axis=0) + 1
+        for group, inst in self._streamed:
+            dset = self._file[group][inst]
+            data = self.point_dict[inst]
+            if np.prod(high - low) <= 4*len(indices):
+                #Points are close together (ie along a line) so write the
+                #block containing all of them
+                box = tuple(slice(l, h) for l, h in zip(low, high))
+                dset[box] = data[box]
+            else:
+                for index in self._pending:
+                    dset[index] = data[index]
+        self._file.flush()
+        self._pending = []
+    
+    def close(self):
+        """Flushes pending points and closes the file"""
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+    
+    def finish(self, savedData):
+        """Closes the file and adds the header and metadata of the finished
+        sweep. After this the file is equivalent to one written by save.
+        
+        Args:
+            savedData: savedData object of the finished sweep
+        """
+        self.close()
+        with h5py.File(self.filename, 'a') as f:
+            _writeHeader(f, savedData)
+            _writeMetadata(f, savedData.state)
+            f.attrs['complete'] = True
+
+def _writeMetadata(f, metadata):
+    """Writes the state of each instrument as a JSON string. Snapshots that are
+    pandas DataFrames (such as from qdacWrapper) are marked so they can be
+    rebuilt on load."""
+    group = f.require_group('metadata')
+    for inst in metadata:
+        snapshot = metadata[inst]
+        if isinstance(snapshot, pd.DataFrame):
+            kind = 'dataframe'
+            snapshot = snapshot.to_dict('split')
+        else:
+            kind = 'json'
+        if inst in group:
+            del group[inst]
+        dset = group.create_dataset(inst, data=json.dumps(snapshot, default=_jsonDefault))
+        dset.attrs['kind'] = kind
+
+def _readMetadata(f):
+    """Reads the metadata group back into a dictionary of snapshots"""
+    metadata = {}
+    if 'metadata' not in f:
+        return metadata
+    for inst, dset in f['metadata'].items():
+        snapshot = json.loads(_str(dset[()]))
+        if _str(dset.attrs['kind']) == 'dataframe':
+            snapshot = pd.DataFrame(data=snapshot['data'], index=snapshot['index'],
+                                    columns=snapshot['columns'])
+        metadata[inst] = snapshot
+    return metadata
+
+def _jsonDefault(obj):
+    """Converts numpy types (common in QCoDeS snapshots) for json"""
+    if isinstance(obj, np.integer):
+        return int(obj)
+    if isinstance(obj, np.floating):
+        return float(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    return str(obj)
+
+def _str(value):
+    """h5py may return strings as bytes depending on version"""
+    if isinstance(value, bytes):
+        return value.decode()
+    return value
@@ -1,43 +1,66 @@
 import tkinter as tk
 import threading
-import queue
 
 class GUI(threading.Thread):
     #Tkinter class for background updating of instrument values
-    request_queue = queue.Queue()
-    result_queue = queue.Queue()
+    #
+    #Values are submitted from other threads (such as every ramp of a sweep)
+    #much faster than labels can be redrawn. Submitted values are therefore
+    #coalesced to the latest value of each label, which replaces (drops) any
+    #older value not displayed yet, so the backlog is never larger than the
+    #number of labels. Every tick takes all waiting values at once and only
+    #redraws labels whose text changed.
+    
+    #Time between ticks in ms
+    tickInterval = 10
     
     def __init__(self):
         threading.Thread.__init__(self)
+        #Latest value of each label not displayed yet, as {(row, column): value}
+        self._pending = {}
+        self._lock = threading.Lock()
+        #Text currently shown by each label
+        self._shown = {}
+        self.label_dict = {}
+        self.t = None
         
     def submit_to_tkinter(self,loc, value):
-        self.request_queue.put((loc, value))
-        #return result_queue.get()
+        self.submit_many([(loc, value)])
+        
+    def submit_many(self, updates):
+        """Submits several values at once, which are displayed in the same
+        tick
+        
+        Args:
+            updates: List of (loc, value)
+        """
+        with self._lock:
+            for loc, value in updates:
+                self._pending[tuple(loc)] = value
         
     def update_name(self, loc, name):
         """Name goes in column 1, with row = channel #"""
-        self.request_queue.put((loc, name))
+        self.submit_many([(loc, name)])
+    
+    def _takePending(self):
+        """Returns all values waiting to be displayed"""
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+        return pending
 
-    t = None
-    label_dict ={}
     def run(self):
         #global t
 
         def timertick():
-            try: 
-                loc, value = self.request_queue.get_nowait()
-                
-                #display_label = self.label_dict[loc[0]][loc[1]]
-                #display_label.config(text='%s' % (value,))
-            except queue.Empty:
-                pass
-            else:
-
-                display_label = self.label_dict[loc[0]][loc[1]]
-                display_label.config(text='%s' % (value,))
+            for (row, column), value in self._takePending().items():
+                text = '%s' % (value,)
+                if self._shown.get((row, column)) != text:
+                    self.label_dict[row][column].config(text=text)
+                    self._shown[(row, column)] = text
             
-            #Wait 10ms then run timertick again 
-            self.t.after(10, timertick)
+            #Wait tickInterval then run timertick again 
+            self.t.after(self.tickInterval, timertick)
 
         self.t = tk.Tk()
         self.t.configure(width=640, height=480, background ='black')
@@ -0,0 +1,192 @@
+import os
+import time
+import atexit
+import sqlite3
+import threading
+import collections
+
+#Journal is kept next to the data files, in the current folder
+JOURNAL_FILE = 'journal.db'
+
+_SCHEMA = """CREATE TABLE IF NOT EXISTS journal (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    instrument TEXT NOT NULL,
+    value)"""
+
+#Finds the last value of an instrument before a time without scanning
+_INDEX = 'CREATE INDEX IF NOT EXISTS journal_instrument_ts ON journal (instrument, ts)'
+
+class Journal:
+    """Append-only record of every value instruments were ramped to, such that
+    the state of the setup at any time can be looked up later (see stateAt).
+
+    Entries are kept in memory and written to an SQLite file in batches, once
+    flushSize entries are waiting or the oldest has waited flushInterval
+    seconds, so recording a ramp costs no more than appending to a list.
+    Every entry gets an increasing ID when it is written, and datasets store
+    the ID of the last entry before they were saved (their journal offset)
+    instead of needing the full state. IDs are assigned by SQLite, so several
+    Journals (ie of different processes) can write to the same file.
+    """
+    def __init__(self, filename=JOURNAL_FILE, capacity=100000, flushSize=1000,
+                 flushInterval=5):
+        """
+        Args:
+            filename: (default=JOURNAL_FILE) SQLite file of the journal.
+                Relative to the current folder when the Journal is made.
+
+            capacity: (default=100000) Most entries kept in memory. If the
+                file cannot be written (ie locked by another process) for so
+                long that more entries are waiting, the oldest are dropped.
+
+            flushSize: (default=1000) Number of waiting entries that are
+                written at once
+
+            flushInterval: (default=5) Longest time in seconds an entry waits
+                in memory while entries are being recorded
+        """
+        self.filename = os.path.abspath(filename)
+        self.flushSize = flushSize
+        self.flushInterval = flushInterval
+        self.dropped = 0
+        self._pending = collections.deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._lastFlush = time.time()
+        self._flushAtExit = False
+
+    def _connect(self):
+        """Opens the journal file. A new connection is made for every call
+        since entries are recorded from the sweep threads."""
+        conn = sqlite3.connect(self.filename, timeout=10)
+        conn.execute(_SCHEMA)
+        conn.execute(_INDEX)
+        return conn
+
+    @property
+    def offset(self):
+        """ID of the last entry in the file, or 0 if there is none. Waiting
+        entries are written first, so it includes every recorded entry."""
+        self.flush()
+        conn = self._connect()
+        offset = conn.execute('SELECT MAX(id) FROM journal').fetchone()[0] or 0
+        conn.close()
+        return offset
+
+    def record(self, instrument, value):
+        """Records that an instrument was ramped to a value
+
+        Args:
+            instrument: Name of the instrument or channel
+
+            value: Value it was ramped to
+        """
+        self.recordMany([(instrument, value)])
+
+    def recordMany(self, entries):
+        """Records several ramps at the same time
+
+        Args:
+            entries: List of (instrument, value)
+        """
+        now = time.time()
+        if not self._flushAtExit:
+            #Entries still in memory are written when Python exits
+            atexit.register(self._exitFlush)
+            self._flushAtExit = True
+        with self._lock:
+            for instrument, value in entries:
+                if len(self._pending) == self._pending.maxlen:
+                    self.dropped += 1
+                self._pending.append((now, instrument, _value(value)))
+            due = (len(self._pending) >= self.flushSize or
+                   now - self._lastFlush >= self.flushInterval)
+        if due:
+            try:
+                self.flush()
+            except sqlite3.Error as error:
+                #Kept in memory and written with the next flush
+                print('Could not write journal: %s' % (error,))
+
+    def flush(self):
+        """Writes all waiting entries to the file"""
+        with self._lock:
+            self._lastFlush = time.time()
+            if not self._pending:
+                return
+            entries = list(self._pending)
+            self._pending.clear()
+            try:
+                conn = self._connect()
+                with conn:
+                    conn.executemany('INSERT INTO journal (ts, instrument, value) '
+                                     'VALUES (?, ?, ?)', entries)
+                conn.close()
+            except sqlite3.Error:
+                self._pending.extendleft(reversed(entries))
+                raise
+
+    def _exitFlush(self):
+        """Writes waiting entries when Python exits, where an error can only
+        be reported"""
+        try:
+            self.flush()
+        except sqlite3.Error as error:
+            print('Could not write %d journal entries: %s' % (len(self._pending), error))
+
+    def stateAt(self, t=None, offset=None):
+        """Returns the value of every recorded instrument at a time, as
+        {instrument: value}. Instruments that were first ramped later are
+        left out.
+
+        Args:
+            t: (Optional) Time as time.time(). Defaults to now.
+
+            offset: (Optional) Only include entries up to this ID, such as the
+                journal offset of a dataset
+        """
+        self.flush()
+        if t is None:
+            t = time.time()
+        if offset is None:
+            offset = self.offset
+        conn = self._connect()
+        state = {}
+        #Steps through the instruments in the index, one lookup each, instead
+        #of reading every entry
+        instrument = conn.execute('SELECT MIN(instrument) FROM journal').fetchone()[0]
+        while instrument is not None:
+            row = conn.execute('SELECT value FROM journal WHERE instrument = ? AND ts <= ? '
+                               'AND id <= ? ORDER BY ts DESC, id DESC LIMIT 1',
+                               (instrument, t, offset)).fetchone()
+            if row:
+                state[instrument] = row[0]
+            instrument = conn.execute('SELECT MIN(instrument) FROM journal WHERE instrument > ?',
+                                      (instrument,)).fetchone()[0]
+        conn.close()
+        return state
+
+    def history(self, instrument, start=None, end=None):
+        """Returns list of (time, value) of every ramp of an instrument
+
+        Args:
+            instrument: Name of the instrument or channel
+
+            start: (Optional) Only include ramps from this time (as time.time())
+
+            end: (Optional) Only include ramps up to this time
+        """
+        self.flush()
+        conn = self._connect()
+        rows = conn.execute('SELECT ts, value FROM journal WHERE instrument = ? '
+                            'AND ts >= ? AND ts <= ? ORDER BY ts, id',
+                            (instrument, -float('inf') if start is None else start,
+                             float('inf') if end is None else end)).fetchall()
+        conn.close()
+        return rows
+
+def _value(value):
+    """Converts numpy scalars, which SQLite cannot store"""
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
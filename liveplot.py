@@ -0,0 +1,292 @@
+import time
+from functools import partial
+import numpy as np
+import pandas as pd
+import holoviews as hv
+import saveClass
+import scanorder
+
+class LivePlot:
+    """Live plot of a running sweep. Holds the Holoviews objects displayed in
+    the main thread and decides when and how they are redrawn.
+
+    Redrawing rebuilds every element from the full arrays and Bokeh sends the
+    whole plot to the browser, which for fast measurements takes longer than
+    measuring. Points measured in between redraws are therefore coalesced:
+    the plot is redrawn at most once every refreshInterval seconds, and for
+    refreshPerLine only when a fast-axis line has been completed.
+
+    With incremental updates only the new points are sent to the browser.
+    1D sweeps stream the new points through a Holoviews Buffer. 2D sweeps
+    patch the changed part of the image directly in the Bokeh data source of
+    the displayed plot. Until the plot has been displayed (or with a backend
+    other than Bokeh) the full plot is redrawn instead.
+    
+    For progressive 2D sweeps the image shows a preview, where every measured
+    point fills the block of points around it that is not measured yet (see
+    scanorder.preview).
+    
+    Sweeps of more than two instruments show the image of the last two
+    instruments at the current setpoint of the outer ones, which is redrawn
+    in full whenever an outer instrument steps.
+    """
+
+    def __init__(self, points, sweepNames, measNames, refreshInterval=0.2,
+                 refreshPerLine=False, incremental=True, preview=False,
+                 adaptive=False):
+        """
+        Args:
+            points: point_dict of the sweep that is plotted
+
+            sweepNames: List of names of the swept instruments
+
+            measNames: List of names of the measured instruments
+
+            refreshInterval: Minimum time in seconds between redraws. Use 0 to
+                redraw after every point.
+
+            refreshPerLine: If True, only redraw when a fast-axis line is
+                completed (still at most once every refreshInterval)
+
+            incremental: If True, only send new points to the browser on a
+                redraw instead of the whole plot
+            
+            preview: If True, fill in unmeasured points of a 2D sweep from
+                the closest coarser measured point
+            
+            adaptive: If True, the sweep is adaptive and 1D points are drawn
+                sorted by setpoint (see saveClass.buildElement)
+        """
+        self.point_dict = points
+        self.sweepNames = sweepNames
+        self.measNames = measNames
+        self.refreshInterval = refreshInterval
+        self.refreshPerLine = refreshPerLine
+        self.incremental = incremental
+        self.preview = preview and len(sweepNames) >= 2
+        self.adaptive = adaptive
+
+        #Only the last two swept instruments are displayed, at the index
+        #_outer of the outer ones (outermost first)
+        self.displayNames = sweepNames[-2:]
+        self._outer = (0,)*(len(sweepNames) - len(self.displayNames))
+        self._redraw = False
+
+        #Indices of points that are not displayed yet
+        self._pending = []
+        self._lastRefresh = 0
+
+        if incremental and len(sweepNames) == 1:
+            self._initBuffer()
+        elif incremental:
+            self._initPatch()
+        else:
+            #The DynamicMap works through streams where some function can
+            #stream data into the plot. Since here we are just updating the
+            #data displayed, the function just returns a plot of the current
+            #data (built the same way as a saved plot).
+            self.dmap = hv.DynamicMap(self.current,
+                                      streams=[hv.streams.Stream.define("Dummy")()])
+
+    def current(self):
+        """Returns a new plot of the current data. Also used to get a copy of
+        the plot independent of the DynamicMap in the main thread."""
+        plot = None
+        for i, name in enumerate(self.measNames):
+            element = self._element(name, i)
+            plot = element if plot is None else plot + element
+        return plot
+    
+    def _element(self, name, number):
+        """Returns the plot of a single measured parameter as displayed"""
+        element = saveClass.buildElement(self._displayed([name]),
+                                         self.displayNames, name, number,
+                                         self.adaptive)
+        if self._outer:
+            label = ', '.join('%s=%s' % (inst, self.point_dict[inst][i]) for inst, i
+                              in zip(self.sweepNames, self._outer))
+            element = element.relabel(label)
+        return element
+    
+    def _displayed(self, measNames):
+        """Returns the points of the given measured parameters as they are
+        displayed, ie only the current image of the last two swept
+        instruments and with the preview filled in"""
+        if self._outer:
+            points = saveClass.innerSlice(self.point_dict, self.sweepNames,
+                                          measNames, self._outer)
+        else:
+            points = dict(self.point_dict)
+        if self.preview:
+            for name in measNames:
+                points[name] = scanorder.preview(points[name])
+        return points
+    
+    def _block(self, name, rows, cols):
+        """Returns a block of a measured parameter as it is displayed (see
+        _displayed), computing the preview of only that block
+        
+        Args:
+            name: Name of the measured parameter
+            
+            rows, cols: Slices of the block in the displayed image
+        """
+        if self._outer:
+            data = saveClass.innerSlice(self.point_dict, self.sweepNames,
+                                        [name], self._outer)[name]
+        else:
+            data = self.point_dict[name]
+        if not self.preview:
+            return data[rows, cols]
+        #Preview values only depend on points at multiples of the strides
+        #above and to the left, so a block starting at a multiple of the
+        #coarsest stride has the same preview as in the whole image
+        top = rows.start // scanorder.COARSEST * scanorder.COARSEST
+        left = cols.start // scanorder.COARSEST * scanorder.COARSEST
+        filled = scanorder.preview(data[top:rows.stop, left:cols.stop])
+        return filled[rows.start - top:, cols.start - left:]
+
+    def point(self, index):
+        """Called after a point is measured. Redraws if enough time has passed.
+
+        Args:
+            index: Index of the point in the measured arrays
+        """
+        if self._outer:
+            #Measured arrays are indexed in reverse order of the swept
+            #instruments, so the outer instruments are last
+            outer = tuple(index[len(self.displayNames):])[::-1]
+            if outer != self._outer:
+                #Points of the previous image are not displayed anymore
+                self._outer = outer
+                self._redraw = True
+                self._pending = []
+            index = tuple(index[:len(self.displayNames)])
+        self._pending.append(index)
+        if not self.refreshPerLine:
+            self._refresh()
+
+    def lineDone(self):
+        """Called after a fast-axis line is completed"""
+        self._refresh()
+
+    def finish(self):
+        """Redraws the remaining points at the end of the sweep"""
+        self._refresh(force=True)
+
+    def _refresh(self, force=False):
+        if not self._pending:
+            return
+        now = time.time()
+        if force or now - self._lastRefresh >= self.refreshInterval:
+            if not self.incremental:
+                #Basically just calls current again
+                self.dmap.event()
+            elif self._redraw:
+                #An outer instrument stepped, so the image is a new one
+                self._ranges = {}
+                for dmap in self._dmaps.values():
+                    dmap.event()
+            elif len(self.sweepNames) == 1:
+                self._sendBuffer()
+            else:
+                self._sendPatch()
+            self._lastRefresh = now
+            self._pending = []
+            self._redraw = False
+
+    def _initBuffer(self):
+        """Sets up streaming of new points of a 1D sweep"""
+        x_name = self.sweepNames[0]
+        x_data = self.point_dict[x_name]
+        columns = [x_name] + list(self.measNames)
+        self._buffer = hv.streams.Buffer(pd.DataFrame(columns=columns, dtype=float),
+                                         length=len(x_data), index=False)
+        self.dmap = None
+        for i, name in enumerate(self.measNames):
+            dmap = hv.DynamicMap(partial(self._curve, name, i), streams=[self._buffer])
+            #Show the full range of the sweep from the start
+            dmap = dmap.redim.range(**{x_name: (np.min(x_data), np.max(x_data))})
+            self.dmap = dmap if self.dmap is None else self.dmap + dmap
+
+    def _curve(self, name, number, data):
+        return hv.Curve(data, kdims=self.sweepNames[0],
+                        vdims=name).options(color=hv.Cycle('Colorblind').values[number])
+
+    def _sendBuffer(self):
+        """Sends the pending points of a 1D sweep through the Buffer"""
+        indices = [index[0] for index in self._pending]
+        new = {self.sweepNames[0]: self.point_dict[self.sweepNames[0]][indices]}
+        for name in self.measNames:
+            new[name] = self.point_dict[name][indices]
+        self._buffer.send(pd.DataFrame(new, columns=[self.sweepNames[0]] + list(self.measNames)))
+
+    def _initPatch(self):
+        """Sets up patching of new points of a 2D sweep. Each measured
+        parameter gets its own DynamicMap, whose Bokeh plot is captured by a
+        hook once it is displayed."""
+        self._bokehPlots = {}
+        self._ranges = {}
+        self._dmaps = {}
+        self.dmap = None
+        for i, name in enumerate(self.measNames):
+            dmap = hv.DynamicMap(partial(self._image, name, i),
+                                 streams=[hv.streams.Stream.define("Dummy")()])
+            self._dmaps[name] = dmap
+            self.dmap = dmap if self.dmap is None else self.dmap + dmap
+
+    def _image(self, name, number):
+        def hook(plot, element):
+            if 'source' in plot.handles:
+                self._bokehPlots[name] = plot
+        return self._element(name, number).opts(plot=dict(finalize_hooks=[hook]))
+
+    def _sendPatch(self):
+        """Patches the block of the image containing the pending points"""
+        x_data = self.point_dict[self.displayNames[0]]
+        y_data = self.point_dict[self.displayNames[1]]
+        indices = np.array(self._pending)
+        low = [int(i) for i in indices.min(axis=0)]
+        if self.preview:
+            #Each point fills the block of its stride
+            extent = np.array([np.array(index) + scanorder.strideOf(index)
+                               for index in self._pending])
+            high = [min(int(i), len(data)) for i, data in
+                    zip(extent.max(axis=0), (y_data, x_data))]
+        else:
+            high = [int(i) + 1 for i in indices.max(axis=0)]
+        rows = slice(low[0], high[0])
+        cols = slice(low[1], high[1])
+        for name in self.measNames:
+            plot = self._bokehPlots.get(name)
+            if plot is None:
+                self._dmaps[name].event()
+                continue
+            block = self._block(name, rows, cols)
+
+            #Bokeh draws the first row of the image at the bottom and the
+            #first column on the left, so flip for decreasing setpoints
+            row_slice = rows
+            col_slice = cols
+            if len(y_data) > 1 and y_data[0] > y_data[-1]:
+                block = block[::-1]
+                row_slice = slice(len(y_data) - high[0], len(y_data) - low[0])
+            if len(x_data) > 1 and x_data[0] > x_data[-1]:
+                block = block[:, ::-1]
+                col_slice = slice(len(x_data) - high[1], len(x_data) - low[1])
+            plot.handles['source'].patch({'image': [((0, row_slice, col_slice),
+                                                     block.ravel())]})
+
+            #Framewise color normalization only needs the new values
+            if not np.isnan(block).all():
+                low_value = np.nanmin(block)
+                high_value = np.nanmax(block)
+                if name in self._ranges:
+                    low_value = min(low_value, self._ranges[name][0])
+                    high_value = max(high_value, self._ranges[name][1])
+                self._ranges[name] = (low_value, high_value)
+                mapper = plot.handles.get('color_mapper')
+                if mapper is not None:
+                    mapper.update(low=low_value, high=high_value)
+            if hasattr(plot, 'push'):
+                plot.push()
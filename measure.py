@@ -1,9 +1,14 @@
+import time
 import numpy as np
 from plotting import PlottingOverview
 import ipywidgets as widgets
 import param
 import holoviews as hv
-import pickle
+import datafile
+import catalog
+import scanorder
+import adaptive
+import journal
 
 class Measurement:
     """Overview object that manages all instruments in experiment and handles
@@ -12,6 +17,18 @@ class Measurement:
     
     def __init__(self):
         self.instrumentDict = {}
+        #Every name (of instruments and of channels of multi-channel
+        #instruments) as {name: instrument or channel object}, updated on add
+        #and rename (see _register)
+        self._registry = {}
+        #Last snapshot of each instrument as {name: snapshot}. An instrument
+        #is snapshot again only after it was changed through this object
+        #(see invalidateState)
+        self._stateCache = {}
+        #Record of every ramp (see journal.py). Instruments with a journal
+        #attribute (such as qdacWrapper) record the ramps of their channels
+        #themselves.
+        self.journal = journal.Journal()
         self._plottingManager = PlottingOverview()
     
     def ramp(self, instruments, values):
@@ -33,11 +50,69 @@ class Measurement:
         if len(instruments) != len(values):
             raise Exception("Different number of channels provided than voltages")
         
-        for inst, value in zip(instruments, values):
-            inst.ramp(value)
+        #Channels of the same multi-channel instrument are ramped together,
+        #such that the instrument can send the commands for all of them at once
+        groups = {}
+        try:
+            for inst, value in zip(instruments, values):
+                parent = getattr(inst, 'parent', None)
+                if hasattr(parent, '_rampChannels'):
+                    group = groups.setdefault(id(parent), (parent, [], []))
+                    group[1].append(inst)
+                    group[2].append(value)
+                else:
+                    inst.ramp(value)
+            for parent, channels, channel_values in groups.values():
+                if len(channels) > 1:
+                    parent._rampChannels(channels, channel_values)
+                else:
+                    channels[0].ramp(channel_values[0])
+            self._journalRamp(instruments, values)
+        finally:
+            #Also if the ramp failed halfway
+            self.invalidateState(instruments)
         return
+    
+    def _journalRamp(self, instruments, values):
+        """Records ramps in the journal, except for channels of instruments
+        that record their own"""
+        self.journal.recordMany([(inst.name, value) for inst, value in zip(instruments, values)
+                                 if getattr(getattr(inst, 'parent', None), 'journal', None) is None])
+    
+    def stateAt(self, t):
+        """Returns the value every instrument was last ramped to at a given
+        time, as {name: value} (see journal.Journal.stateAt)
+        
+        Args:
+            t: Time as a time.time() timestamp, or a string such as
+                '2019-03-04 15:30:00'
+        """
+        if isinstance(t, str):
+            t = time.mktime(time.strptime(t, '%Y-%m-%d %H:%M:%S'))
+        return self.journal.stateAt(t)
+    
+    def setParameter(self, instrument, parameter, value):
+        """Sets a parameter of an instrument (such as the time constant of a
+        lock-in), through the set method of QCoDeS instruments
+        
+        Args:
+            instrument: Name of instrument
+            
+            parameter: Name of the parameter
+            
+            value: Value to set the parameter to
+        """
+        if self._plottingManager.currentlyRunning:
+            raise Exception("Sweep currently in progress. Please wait for sweeps to finish before setting parameters.")
+        instrument = self._getInstrument(instrument)
+        try:
+            instrument.set(parameter, value)
+        finally:
+            self.invalidateState([instrument])
         
-    def sweep(self, sweepInst, start, end, steps, measureParams):
+    def sweep(self, sweepInst, start, end, steps, measureParams, stream=False,
+              refreshInterval=0.2, settle=None, concurrent=False,
+              buffered=None):
         """1D Sweep. Will display plot inline, but if assigned
         (ie result = sweep(..)) the return value should also be the
         updating plot.
@@ -56,23 +131,51 @@ class Measurement:
                 
             measureParams: List of names of measurement instruments to be
                 measured at each point.
-        """
-        
-        sweepInst = self._getInstrument(sweepInst)
-        measInsts = self._convertInstruments(measureParams)
-        
-        x_data = np.linspace(start, end, steps+1)
-        points = {sweepInst.name: x_data}
-        
-        for inst in measInsts:
-            points[inst.name] = np.full(len(x_data), np.nan)
             
-        return self._plottingManager._sweep(sweepInst, measInsts, points,
-                                            self)
+            stream: (default=False) If True, data is written to disk while
+                the sweep is running, so a crash does not lose the data
+                measured so far. The file can be loaded at any time as a
+                partial dataset.
+            
+            refreshInterval: (default=0.2) Minimum time in seconds between
+                redraws of the plot. Points measured in between are drawn
+                together, so that plotting does not slow down measuring. Use
+                0 to redraw after every point.
+            
+            settle: (Optional) How long to wait after each step before
+                measuring, as a settle policy from settle.py (ie
+                settle.FixedSettle(.3) or settle.StepSettle(1)). The default
+                is the settlePolicy attribute of the instrument if it has
+                one, otherwise 100 ms.
+            
+            concurrent: (default=False) If True, all measurement instruments
+                are read at the same time (from separate threads) instead of
+                one after another. Only use with instruments that can be
+                safely accessed from different threads, ie not sharing one
+                connection.
+            
+            buffered: (Optional) Time in seconds per point for a
+                hardware-timed sweep, such as .001. Instead of ramping and
+                measuring point by point, the whole sweep is uploaded to the
+                swept instrument (ie as a QDAC AWG waveform, which runs at
+                1000 points per second) and the measurement instruments
+                acquire all points at once, triggered by the swept instrument.
+                The swept instrument needs a bufferedLine method and the
+                measurement instruments armBuffered and readBuffered methods.
+                If the swept instrument has a checkBuffered method, it is
+                called with the line length and interval before anything is
+                ramped.
+        """
+        return self.sweepND([(sweepInst, np.linspace(start, end, steps+1))],
+                            measureParams, stream=stream,
+                            refreshInterval=refreshInterval, settle=settle,
+                            concurrent=concurrent, buffered=buffered)
         
     
     def sweep2D(self, sweepInst1, start1, end1, steps1, sweepInst2, start2,
-                end2, steps2, measureParams):
+                end2, steps2, measureParams, stream=False,
+                refreshInterval=0.2, refreshPerLine=False, settle=None,
+                concurrent=False, order='raster', buffered=None):
         """2D Sweep. Will display plot inline, but if
         assigned (ie result = sweep(..)) the return value should also be the
         updating plot.
@@ -100,20 +203,207 @@ class Measurement:
             
             measureParams: List of names of measurement instruments to be
                 measured at each point.
+            
+            stream: (default=False) If True, data is written to disk after
+                every fast-axis line (see 'sweep' docstring)
+            
+            refreshInterval: (default=0.2) Minimum time in seconds between
+                redraws of the plot (see 'sweep' docstring)
+            
+            refreshPerLine: (default=False) If True, only redraw the plot once
+                a full fast-axis line has been measured
+            
+            settle: (Optional) Settle policy for both instruments, or
+                dictionary of {instrumentName: policy} to use a different
+                policy per instrument (see 'sweep' docstring)
+            
+            concurrent: (default=False) Read all measurement instruments at
+                the same time (see 'sweep' docstring)
+            
+            order: (default='raster') Order in which points are measured. The
+                data ends up in the same place for every order.
+                'raster': each line sweeps the second instrument from start2
+                    to end2, which then ramps back to start2 for the next line
+                'serpentine': every other line sweeps the second instrument
+                    backwards, so it never has to ramp back across the range
+                'columnFirst': the axes are swapped, each line sweeps the
+                    first instrument for one value of the second instrument
+                'progressive': coarse to fine, first every 16th point along
+                    both axes, then every 8th and so on. The plot shows a low
+                    resolution preview of the full range early on, and an
+                    aborted sweep still holds a complete map at a lower
+                    resolution (see scanorder.completedStride).
+            
+            buffered: (Optional) Time in seconds per point for hardware-timed
+                lines of the second (fast) instrument (see 'sweep' docstring).
+                Only the 'raster' and 'serpentine' orders can be used.
+        """
+        return self.sweepND([(sweepInst1, np.linspace(start1, end1, steps1+1)),
+                             (sweepInst2, np.linspace(start2, end2, steps2+1))],
+                            measureParams, stream=stream,
+                            refreshInterval=refreshInterval,
+                            refreshPerLine=refreshPerLine, settle=settle,
+                            concurrent=concurrent, order=order,
+                            buffered=buffered)
+    
+    def sweepND(self, axes, measureParams, stream=False, refreshInterval=0.2,
+                refreshPerLine=False, settle=None, concurrent=False,
+                order='raster', buffered=None):
+        """Sweep of any number of instruments, such as a 2D gate-gate map
+        repeated for several magnetic fields. An instrument is only ramped
+        when its setpoint changes, ie outer instruments are ramped once per
+        inner sweep. The plot shows the image of the last two instruments for
+        the current setpoint of the outer ones.
+        
+        Measured arrays have one axis per swept instrument in reverse order,
+        such that data[..., k] is the 2D map of the last two instruments at
+        the k-th setpoint of the first instrument (for three instruments).
+        
+        Args:
+            axes: List of (name, setpoints) of each instrument to be swept,
+                outermost (slowest) first. setpoints is the list of values
+                to sweep to, ie np.linspace(start, end, steps+1).
+            
+            measureParams: List of names of measurement instruments to be
+                measured at each point.
+            
+            stream, refreshInterval, refreshPerLine, settle, concurrent: See
+                'sweep2D' docstring
+            
+            order: (default='raster') Order in which the points of the last
+                two instruments are measured (see 'sweep2D' docstring). The
+                outer instruments are stepped once the inner two are done.
+            
+            buffered: (Optional) Time in seconds per point for hardware-timed
+                lines of the last instrument (see 'sweep' docstring)
         """
-        sweepInst1 = self._getInstrument(sweepInst1)
-        sweepInst2 = self._getInstrument(sweepInst2)
+        if order not in scanorder.ORDERS:
+            raise Exception('Unknown scan order %s, use one of %s' % (order, scanorder.ORDERS))
+        sweepInsts = [self._getInstrument(name) for name, setpoints in axes]
         measInsts = self._convertInstruments(measureParams)
+        if buffered:
+            if order not in ('raster', 'serpentine'):
+                raise Exception('Buffered sweeps can only use the raster or serpentine order')
+            if not hasattr(sweepInsts[-1], 'bufferedLine'):
+                raise Exception('%s does not support buffered sweeps' % (sweepInsts[-1].name,))
+            if hasattr(sweepInsts[-1], 'checkBuffered'):
+                #Limits of the swept instrument, such as the AWG size
+                sweepInsts[-1].checkBuffered(len(axes[-1][1]), buffered)
+            for inst in measInsts:
+                if not (hasattr(inst, 'armBuffered') and hasattr(inst, 'readBuffered')):
+                    raise Exception('%s does not support buffered measurements' % (inst.name,))
+        
+        points = {}
+        for inst, (name, setpoints) in zip(sweepInsts, axes):
+            points[inst.name] = np.array(setpoints, dtype=float)
+        
+        #Measured arrays are indexed in reverse order, ie [y, x] for 2D
+        shape = tuple(len(points[inst.name]) for inst in sweepInsts[::-1])
+        for inst in measInsts:
+            points[inst.name] = np.full(shape, np.nan)
+            
+        return self._plottingManager._sweep(sweepInsts, measInsts, points,
+                                            self, stream=stream,
+                                            refreshInterval=refreshInterval,
+                                            refreshPerLine=refreshPerLine,
+                                            settle=settle,
+                                            concurrent=concurrent,
+                                            order=order, buffered=buffered)
+        
+    def sweepAdaptive(self, sweepInst, start, end, measureParams, npoints=100,
+                      lossGoal=None, stream=False, refreshInterval=0.2,
+                      settle=None, concurrent=False):
+        """Adaptive 1D Sweep. Instead of stepping evenly from start to end,
+        each point is picked from the data measured so far, such that points
+        are concentrated where the measured values change quickly (ie on
+        Coulomb peaks) and few are spent on flat regions (see adaptive.py).
         
-        x_data = np.linspace(start1, end1, steps1+1)
-        y_data = np.linspace(start2, end2, steps2+1)
-        points = {sweepInst1.name: x_data, sweepInst2.name: y_data}
+        Args:
+            sweepInst: Name of instrument to be swept
+            
+            start: Initial value of the range to sweep
+            
+            end: Final value of the range to sweep
+            
+            measureParams: List of names of measurement instruments to be
+                measured at each point. All of them are used to pick the
+                next point.
+            
+            npoints: (default=100) Maximum number of points to measure
+            
+            lossGoal: (Optional) Stop before npoints once the data is
+                resolved well enough, ie once no interval between points
+                spans more than this fraction of the plot (such as .01)
+            
+            stream, refreshInterval, settle, concurrent: See 'sweep' docstring
+        """
+        sweepInst = self._getInstrument(sweepInst)
+        measInsts = self._convertInstruments(measureParams)
+        learner = adaptive.Learner1D((start, end), npoints, lossGoal)
         
+        #Setpoints are filled in as the points are picked
+        points = {sweepInst.name: np.full(npoints, np.nan)}
         for inst in measInsts:
-            points[inst.name] = np.full((len(y_data), len(x_data)), np.nan)
+            points[inst.name] = np.full(npoints, np.nan)
+        
+        return self._plottingManager._sweep([sweepInst], measInsts, points,
+                                            self, stream=stream,
+                                            refreshInterval=refreshInterval,
+                                            settle=settle,
+                                            concurrent=concurrent,
+                                            learner=learner)
+    
+    def sweepAdaptive2D(self, sweepInst1, start1, end1, sweepInst2, start2,
+                        end2, measureParams, npoints=400, lossGoal=None,
+                        stream=False, refreshInterval=0.2, settle=None,
+                        concurrent=False):
+        """Adaptive 2D Sweep. Points are scattered over the plane, concentrated
+        where the measured values change quickly (see 'sweepAdaptive'
+        docstring). The plot shows the measured points instead of an image.
+        
+        Args:
+            sweepInst1: Name of first instrument to be swept (x-axis)
+            
+            start1: Initial value of the range of the first instrument
+            
+            end1: Final value of the range of the first instrument
+            
+            sweepInst2: Name of second instrument to be swept (y-axis)
             
-        return self._plottingManager._sweep(sweepInst1, measInsts, points,
-                                            self, sweepInst2)
+            start2: Initial value of the range of the second instrument
+            
+            end2: Final value of the range of the second instrument
+            
+            measureParams: List of names of measurement instruments to be
+                measured at each point.
+            
+            npoints: (default=400) Maximum number of points to measure
+            
+            lossGoal: (Optional) Stop before npoints once the data is
+                resolved well enough (see adaptive.Learner2D)
+            
+            stream, refreshInterval, settle, concurrent: See 'sweep2D'
+                docstring
+        """
+        sweepInst1 = self._getInstrument(sweepInst1)
+        sweepInst2 = self._getInstrument(sweepInst2)
+        measInsts = self._convertInstruments(measureParams)
+        learner = adaptive.Learner2D((start1, end1), (start2, end2), npoints,
+                                     lossGoal)
+        
+        #Every point has its own setpoints, filled in as they are picked
+        points = {sweepInst1.name: np.full(npoints, np.nan),
+                  sweepInst2.name: np.full(npoints, np.nan)}
+        for inst in measInsts:
+            points[inst.name] = np.full(npoints, np.nan)
+        
+        return self._plottingManager._sweep([sweepInst1, sweepInst2],
+                                            measInsts, points, self,
+                                            stream=stream,
+                                            refreshInterval=refreshInterval,
+                                            settle=settle,
+                                            concurrent=concurrent,
+                                            learner=learner)
         
     def getPlot(self):
         """Returns savedData object created by last finished sweep"""
@@ -157,18 +447,46 @@ class Measurement:
         Args:
             instName: Name of instrument
         """
-        for name in self.instrumentDict:
-            instrument = self.instrumentDict[name]
-            try:
-                if name == instName:
-                    return instrument
-                
-                if instrument._multiChannel:
-                    if instrument._nameExist(instName):
-                        return instrument._getChannel(instName)
-            except AttributeError:
-                pass
-        raise Exception('No instrument with the name %s exists' % (channel,))
+        instrument = self._registry.get(instName)
+        if instrument is None or getattr(instrument, 'name', instName) != instName:
+            #Channels may have been renamed on the instrument itself, without
+            #the registry being told
+            self._rebuildRegistry()
+            instrument = self._registry.get(instName)
+            if instrument is None:
+                raise Exception('No instrument with the name %s exists' % (instName,))
+        return instrument
+    
+    def _nameTaken(self, name):
+        """Returns whether an instrument or channel with this name exists"""
+        instrument = self._registry.get(name)
+        if instrument is not None and getattr(instrument, 'name', name) != name:
+            self._rebuildRegistry()
+            instrument = self._registry.get(name)
+        return instrument is not None
+    
+    def _register(self, instrument):
+        """Adds the names of an instrument and its channels to the registry.
+        Instruments with _nameListeners (such as qdacWrapper) report
+        renamed channels to _channelRenamed."""
+        self._registry[instrument.name] = instrument
+        if getattr(instrument, '_multiChannel', False):
+            self._registry.update(instrument.channel_mapping)
+            if hasattr(instrument, '_nameListeners'):
+                instrument._nameListeners.append(self._channelRenamed)
+    
+    def _channelRenamed(self, oldName, name, channel):
+        if self._registry.get(oldName) is channel:
+            del self._registry[oldName]
+        self._registry[name] = channel
+    
+    def _rebuildRegistry(self):
+        """Rebuilds the registry from instrumentDict"""
+        self._registry = {}
+        for instrument in self.instrumentDict.values():
+            self._registry[instrument.name] = instrument
+            if getattr(instrument, '_multiChannel', False):
+                self._registry.update(instrument.channel_mapping)
       
     @property
     def InstrumentNames(self):
@@ -190,14 +508,7 @@ class Measurement:
         """Returns a flattened out list of all instrument names including
         individual channels
         """
-        names = []
-        for name in self.instrumentDict:
-            names.append(name)
-            instrument = self.instrumentDict[name]
-            if hasattr(instrument, '_multiChannel'):
-                if instrument._multiChannel:
-                    names.extend(list(instrument.channel_mapping.keys()))
-        return names
+        return list(self._registry)
         
     def addInstrument(self, instrument):
         """Adds an instrument to the experiment and ensures no overlap in name.
@@ -205,18 +516,18 @@ class Measurement:
         Args:
             instrument: Instrument object
         """
-        if instrument.name in self._InstrumentNamesList:
+        if self._nameTaken(instrument.name):
             raise Exception('Instrument name %s already exists as another Instrument or Channel name' % (instrument.name,))
             
-        try:
-            if instrument._multiChannel:
-                for channel_name in instrument.channel_mapping:
-                    if channel_name in self._InstrumentNamesList:
-                        raise Exception('The channel %s already exists as another Instrument or Channel name' % (channel_name,))
-                        
-        except AttributeError:
-            pass
+        if getattr(instrument, '_multiChannel', False):
+            for channel_name in instrument.channel_mapping:
+                if self._nameTaken(channel_name):
+                    raise Exception('The channel %s already exists as another Instrument or Channel name' % (channel_name,))
+        
         self.instrumentDict[instrument.name] = instrument
+        self._register(instrument)
+        if hasattr(instrument, 'journal'):
+            instrument.journal = self.journal
     
     def nameInstrument(self, currInstName, name):
         """Rename an instrument. Will raise an error if the new name is already
@@ -233,14 +544,12 @@ class Measurement:
         if type(name) != str:
             raise Exception("Please use a string for channel name")
         
-        #Check if currInstName valid
-        if currInstName not in self._InstrumentNamesList:
-            raise Exception('No Instrument or Channel with name %s exists' % (currInstName))
+        #Check if currInstName valid (raises exception if not)
+        instrument = self._getInstrument(currInstName)
         
         #Check if name already taken
-        if name in self._InstrumentNamesList:
-            raise Exception('Name already taken by %s' % (self._getInstrument(name)))
-        instrument = self._getInstrument(currInstName)
+        if self._nameTaken(name):
+            raise Exception('Name already taken by %s' % (self._registry[name]))
         
         #Replace instrument name in instrumentDict (if this is a channel of an
 		#instrument, ie QDAC, then the instrument itself handles naming)
@@ -249,32 +558,84 @@ class Measurement:
         except KeyError:
             pass
 
+        self.invalidateState([instrument])
         instrument.name = name
+        self._channelRenamed(currInstName, name, instrument)
     
     def _convertInstruments(self, channels):
         """Convert list of names of instruments or channels into a list of the
         respective instrument objects. Returns this list of instrument objects
         """
-        input_type = type(channels)
-        if input_type in {np.ndarray, list, tuple}:
-            if len(channels) == 1:
-                return self._getInstrument(channels[0])
-            return np.append(self._getInstrument(channels[0]),
-							self._convertInstruments(channels[1:]))
-        else:
-            return np.array([self._getInstrument(channels)])
+        if type(channels) not in {np.ndarray, list, tuple}:
+            channels = [channels]
+        instruments = np.empty(len(channels), dtype=object)
+        instruments[:] = [self._getInstrument(name) for name in channels]
+        return instruments
         
     @property
     def currentState(self):
         """Returns detailed dictionary containing all the current state
         information about each instrument
-        (relies on QCoDeS snapshot feature or user defined equivalent)
+        (relies on QCoDeS snapshot feature or user defined equivalent).
+        Same as getState(), so instruments not changed since their last
+        snapshot are not queried again.
+        """
+        return self.getState()
+    
+    def getState(self, live=False):
+        """Returns dictionary of the state of each instrument as
+        {name: snapshot}.
+        
+        Snapshots are cached, and an instrument is only snapshot again after
+        it was ramped, renamed or had a parameter set through this object
+        (or invalidateState was called for it). Instruments that cache their
+        own snapshot (_snapshotCached, such as qdacWrapper) are always asked,
+        since they can also be changed directly.
+        
+        Args:
+            live: (default=False) If True, snapshot every instrument now
+                (with update=True for QCoDeS instruments), for example after
+                changing instruments outside of this object
         """
         currState = {}
-        for instrument in self.instrumentDict:
-            currState[instrument] = self.instrumentDict[instrument].snapshot()
+        for name, instrument in self.instrumentDict.items():
+            if live:
+                try:
+                    snapshot = instrument.snapshot(update=True)
+                except TypeError:
+                    snapshot = instrument.snapshot()
+            elif name in self._stateCache:
+                snapshot = self._stateCache[name]
+            else:
+                snapshot = instrument.snapshot()
+            if not getattr(instrument, '_snapshotCached', False):
+                self._stateCache[name] = snapshot
+            currState[name] = snapshot
         return currState
     
+    def invalidateState(self, instruments=None):
+        """Marks the cached state of instruments as outdated, such that
+        getState snapshots them again. Needed when an instrument was changed
+        without going through this object.
+        
+        Args:
+            instruments: (Optional) List of instrument or channel objects (or
+                their names). A channel invalidates the instrument it belongs
+                to. All instruments if not given.
+        """
+        if instruments is None:
+            self._stateCache = {}
+            return
+        for instrument in instruments:
+            if isinstance(instrument, str):
+                instrument = self._registry.get(instrument)
+                if instrument is None:
+                    continue
+            parent = getattr(instrument, 'parent', None)
+            if parent is not None and self.instrumentDict.get(getattr(parent, 'name', None)) is parent:
+                instrument = parent
+            self._stateCache.pop(getattr(instrument, 'name', None), None)
+    
     @property
     def readableCurrentState(self):
         """Prints a simplified version of current state that prints easily
@@ -338,7 +699,7 @@ def cut(image):
 							y=widgets.SelectionSlider(options=[("%g"%i,i) for i in y_axis]))
 
 def save(savedData, name = False):
-    """Saves data into pickle format in the current folder.
+    """Saves data as an HDF5 file (see datafile.py) in the current folder.
     
     Args:
         savedData: The data to be saved. This should be a savedData object.
@@ -352,15 +713,19 @@ def save(savedData, name = False):
         save_name = name
     else:
         save_name = savedData.name
-    with open('%s.p' % (save_name,), 'wb') as file:
-        pickle.dump(savedData, file)
+    datafile.save(savedData, save_name + datafile.EXTENSION)
+    catalog.register(save_name + datafile.EXTENSION, savedData)
 
-def load(filename):
-    """Loads a pickle file and returns the associated savedData object
+def load(filename, lazy=True):
+    """Loads a data file and returns the associated savedData object. Older
+    pickle (.p) files can also be loaded.
+    
+    Measured arrays are only read from disk when first used, so loading is
+    fast even for large files (see datafile.LazyArrays).
     
     Args:
-        filename: Name of the pickle file to load
+        filename: Name of the file to load
+        
+        lazy: (default=True) If False, read all data into memory immediately
     """
-    with open(filename, 'rb') as file:
-        savedData = pickle.load(file)
-        return savedData
\ No newline at end of file
+    return datafile.load(filename, lazy)
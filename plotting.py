@@ -1,18 +1,29 @@
 import warnings
-import holoviews as hv
+import itertools
 import time
 import numpy as np
 import threading
 import saveClass
-import pickle
+import datafile
+import catalog
+import thumbnails
+import settle
+import scanorder
+import adaptive
+from liveplot import LivePlot
 import queue
-import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
 
 class PlottingThread(threading.Thread):
-    def __init__(self, threadID, points, dataQueue, retrQueue, instrument1,
-                measurementInstrument, MeasurementRef = None, instrument2 = None,
-                lthread = None):
+    #Whether the live plot only sends new points to the browser (see
+    #liveplot.LivePlot). Set to False to always redraw the full plot.
+    incrementalPlot = True
+    
+    def __init__(self, threadID, points, dataQueue, retrQueue, instruments,
+                measurementInstrument, MeasurementRef = None, lthread = None, stream = False, refreshInterval = 0.2,
+                refreshPerLine = False, settle = None, concurrent = False,
+                order = 'raster', learner = None, buffered = None):
         """Thread object that handles background sweeping and measuring of
 		instruments.
         
@@ -21,7 +32,7 @@ class PlottingThread(threading.Thread):
                 to abort a specific thread by ID.
             
             points: Dictionary of points to sweep to and also contains an np.nan
-                initialized array of measurement data. Measurement data array shape should be length(instrument2) x length(instrument1) Format is roughly {instrumentName: [points to sweep], measurementInstName: [[np.nan,...,np.nan],...]}
+                initialized array of measurement data. Measurement data array shape is the number of points of each swept instrument in reverse order, ie length(instrument2) x length(instrument1) for a 2D sweep. Format is roughly {instrumentName: [points to sweep], measurementInstName: [[np.nan,...,np.nan],...]}
             
             dataQueue: Python Queue object that initial Holoviews DynamicMap is
                 passed through in order to display updating plot in main thread.
@@ -29,9 +40,10 @@ class PlottingThread(threading.Thread):
             retrQueue: Python Queue object that savedData object is passed
                 through when measurement complete or when called for by main thread.
             
-            instrument1: The instrument to be swept on the x-axis
-                (slow axis for 2D sweep). This should be the instrument object
-                itself.
+            instruments: List of the instruments to be swept, outermost
+                (slowest) first. For a 2D sweep these are the instruments on
+                the x-axis (slow axis) and y-axis (fast axis). These should be
+                the instrument objects themselves.
             
             measurementInstrument: The instrument to be measured at each point.
                 This can be a list of instruments if multiple parameters are being measured.
@@ -39,13 +51,47 @@ class PlottingThread(threading.Thread):
             MeasurementRef: Measurement overview object (defined in measure.py). 
                 Used to obtain the metadata of full system state when sweep has finished. 
             
-            instrument2: For 2D sweeps, this is the instrument on the y-axis
-                (fast axis). This should be the instrument object itself.
-            
             lthread: Reference to the thread initialized previous to this one.
                 This is used to ensure that the sweep only starts when the
                 previous thread is finished.
             
+            stream: If True, measured data is written to disk while the sweep
+                is running (see datafile.DataWriter) instead of only when
+                it has finished.
+            
+            refreshInterval: Minimum time in seconds between redraws of the
+                live plot (see liveplot.LivePlot). Points measured in between
+                are drawn together.
+            
+            refreshPerLine: For 2D sweeps, only redraw the live plot when a
+                fast-axis line is completed.
+            
+            settle: Settle policy (see settle.py) used after ramping the swept
+                instruments before measuring. Either one policy for all swept
+                instruments or a dictionary of {instrumentName: policy}.
+                Instruments without a policy use their settlePolicy
+                attribute, or otherwise wait 100 ms.
+            
+            concurrent: If True and more than one instrument is measured, all
+                measurement instruments are read at the same time from a
+                thread pool, so the time per point is that of the slowest
+                instrument instead of the sum.
+            
+            order: Order in which the points of a 2D sweep are measured (see
+                scanorder.py). One of 'raster', 'serpentine', 'columnFirst'
+                or 'progressive'.
+            
+            learner: For adaptive sweeps, the Learner1D or Learner2D (see
+                adaptive.py) that picks the points to measure. The setpoint
+                arrays are then filled in as the sweep runs.
+            
+            buffered: For hardware-timed sweeps, the time in seconds per
+                point of the fast axis (last swept instrument). Each line of
+                the fast axis is swept by the instrument itself through its
+                bufferedLine method, while the measurement instruments
+                acquire the whole line (armBuffered and readBuffered). Only
+                the 'raster' and 'serpentine' orders are supported.
+            
         """
         #General Python threading initialization
         threading.Thread.__init__(self)
@@ -59,53 +105,105 @@ class PlottingThread(threading.Thread):
         
         self.last_thread = lthread
         
-        #Default is 1D sweep, but measure function will change this to 2D based
-		#off existence of second sweep instrument
-        self.sweep2D = False
-        
-        self.inst1 = instrument1
-        self.inst2 = instrument2
+        self.sweepInsts = list(instruments)
+        #Any sweep of more than one instrument is displayed as an image
+        self.sweep2D = len(self.sweepInsts) > 1
         self.measInst = measurementInstrument
         
         self.qu = dataQueue
         self.retrieval_queue = retrQueue
         
         self.MeasurementRef = MeasurementRef
+        
+        self.stream = stream
+        self.writer = None
+        
+        self.refreshInterval = refreshInterval
+        self.refreshPerLine = refreshPerLine
+        
+        self.settle = settle
+        
+        self.concurrent = concurrent
+        self._pool = None
+        
+        self.order = order
+        self.learner = learner
+        self.buffered = buffered
     
     @property
     def _sweepDescription(self):
         """Automatic description that just uses sweep extents. Returns
         description as string"""
-        inst1_dict = self.point_dict[self.inst1.name]
-        if self.sweep2D:
-            inst2_dict = self.point_dict[self.inst2.name]
-            return "x=%s to %s in %s steps and y=%s to %s in %s steps" % (min(inst1_dict), max(inst1_dict), len(inst1_dict)-1, min(inst2_dict), max(inst2_dict), len(inst2_dict)-1)
-        
-        return "x=%s to %s in %s steps" % (min(inst1_dict), max(inst1_dict), len(inst1_dict)-1)
+        #Axes are called x and y, or by instrument name for more than two
+        if len(self.sweepInsts) > 2:
+            axes = self._sweepNames
+        else:
+            axes = 'xy'
+        if self.learner:
+            bounds = self.learner.bounds if self.sweep2D else [self.learner.bounds]
+            extents = ' and '.join('%s=%s to %s' % (axis, min(b), max(b))
+                                   for axis, b in zip(axes, bounds))
+            return "%s adaptive with up to %s points" % (extents, self.learner.npoints)
+        return ' and '.join("%s=%s to %s in %s steps" % (axis, min(inst_dict), max(inst_dict), len(inst_dict)-1)
+                            for axis, inst_dict in zip(axes, (self.point_dict[name] for name in self._sweepNames)))
     
-    def savegen(self, result):
-        """Creates savedData object of measurement data and metadata, and uses
-        current time as the name. Returns savedData object
+    @property
+    def _sweepNames(self):
+        """Returns list of names of the swept instruments"""
+        return [inst.name for inst in self.sweepInsts]
+    
+    def savegen(self, name = None, live = False):
+        """Creates savedData object of a copy of the current measurement data
+        and metadata, and uses current time as the name. Returns savedData
+        object
         
         Args:
-            result: The plot to be saved. Typically is a Holoviews Curve
-                (for 1D sweep) or Image (for 2D sweep), but does not have to be
+            name: (Optional) Name to use instead of the current time
+            
+            live: (default=False) If True, snapshot every instrument now
+                instead of using the cached state of instruments that did
+                not change (see Measurement.getState)
 		"""
-        name = time.strftime('%b-%d-%Y_%H-%M-%S', time.localtime())
-        return saveClass.savedData(result, self.MeasurementRef.currentState, name, self._sweepDescription)
+        if not name:
+            name = time.strftime('%b-%d-%Y_%H-%M-%S', time.localtime())
+        points = {inst: np.array(self.point_dict[inst]) for inst in self.point_dict}
+        #The swept instruments were ramped by this thread
+        self.MeasurementRef.invalidateState(self.sweepInsts)
+        data = saveClass.savedData(points, self._sweepNames,
+                                   [inst.name for inst in self.measInst],
+                                   self.MeasurementRef.getState(live), name,
+                                   self._sweepDescription, bool(self.learner))
+        #The state at any point of the sweep can be looked up in the journal.
+        #The data is still saved if the journal cannot be written.
+        try:
+            data.journalOffset = self.MeasurementRef.journal.offset
+        except Exception as error:
+            print('Could not write journal: %s' % (error,))
+        return data
     
     def save(self, savedData):
-        """Saves a savedData object as pickle file. Also saves a picture of the
-        plot to be used as a thumbnail. Typically the input is the output from
-        the savegen function.
+        """Saves a savedData object as an HDF5 file (see datafile.py). Also
+        saves a picture of the plot to be used as a thumbnail. The thumbnail
+        is rendered in a background process (see thumbnails.py), so the next
+        queued sweep does not wait for it. Typically the input is the output
+        from the savegen function. If data was streamed to disk during the
+        sweep, the streamed file is completed instead of written again.
         
         Args:
             savedData: savedData object containing data and metadata information
         """
         save_name = savedData.name
-        with open('%s.p' % (save_name,), 'wb') as file:
-            pickle.dump(savedData, file)
-        hv.renderer('bokeh').save(savedData.plot.options(toolbar=None), './DataThumbnails/%s' % (save_name,), fmt='png')
+        filename = save_name + datafile.EXTENSION
+        if self.writer and self.writer.name == save_name:
+            self.writer.finish(savedData)
+        else:
+            datafile.save(savedData, filename)
+        catalog.register(filename, savedData)
+        
+        def thumbnail_done(future):
+            if not future.exception():
+                catalog.setThumbnail(filename, future.result())
+        thumbnails.renderAsync(savedData).add_done_callback(thumbnail_done)
     
     def measure(self):
         """Main function run by thread. This creates the Holoviews DynamicMap,
@@ -121,44 +219,13 @@ class PlottingThread(threading.Thread):
             warnings.filterwarnings("ignore", message="All-NaN slice encountered")
             warnings.filterwarnings("ignore", message = "All-NaN axis encountered")
             
-            x_data = self.point_dict[self.inst1.name]
-            if self.inst2:
-                #With existence of second instrument, must be a 2D sweep
-                self.sweep2D = True
-                y_data = self.point_dict[self.inst2.name]
-            
-            #This defines how to update the Holoviews DynamicMap. Essentially
-			#the DynamicMap works through streams where some function can stream data into the plot. Since here we are just updating the data displayed, this function just returns a plot of the current data. Also this is ugly, but not sure how to make this cleaner.
-            def update_fn():
-                if self.sweep2D:
-                    dispsq = hv.Image((x_data, y_data,
-                                        self.point_dict[self.measInst[0].name]),
-                                        kdims=[self.inst1.name, self.inst2.name],
-                                        vdims=self.measInst[0].name).opts(norm=dict(framewise=True),
-                                                                        plot=dict(colorbar=True),
-                                                                        style=dict(cmap='jet'))
-                    for i in range(1,len(self.measInst)):
-                        dispsq += hv.Image((x_data, y_data,
-                                        self.point_dict[self.measInst[i].name]),
-                                        kdims=[self.inst1.name, self.inst2.name],
-                                        vdims=self.measInst[i].name).opts(norm=dict(framewise=True),
-                                                                        plot=dict(colorbar=True),
-                                                                        style=dict(cmap='jet'))
-                    
-                else:
-                    dispsq = hv.Curve((x_data,
-                                    self.point_dict[self.measInst[0].name]),
-                                    kdims=self.inst1.name,
-                                    vdims=self.measInst[0].name).options(framewise=True,
-                                    color=hv.Cycle('Colorblind').values[0])
-                    for i in range(1, len(self.measInst)):
-                        dispsq += hv.Curve((x_data,
-                                            self.point_dict[self.measInst[i].name]), 
-                                            kdims=self.inst1.name,
-                                            vdims=self.measInst[i].name).options(framewise=True,
-                                                                                color=hv.Cycle('Colorblind').values[i])
-                return dispsq
-            dmap = hv.DynamicMap(update_fn, streams=[hv.streams.Stream.define("Dummy")()])
+            #Holds the DynamicMap and handles how often it is updated
+            plot = LivePlot(self.point_dict, self._sweepNames,
+                            [inst.name for inst in self.measInst],
+                            self.refreshInterval,
+                            self.refreshPerLine and self.sweep2D,
+                            self.incrementalPlot and not self.learner,
+                            self.order == 'progressive', bool(self.learner))
             
             #This particular sleep may not be needed, but in general when using
             #background threads without blocking in main thread, may not get
@@ -166,7 +233,7 @@ class PlottingThread(threading.Thread):
             time.sleep(.1)
             
             #Send DynamicMap to main thread to be displayed
-            self.qu.put(dmap)
+            self.qu.put(plot.dmap)
             #This sleep helps fix some issues where main thread plot wouldn't
             #show updates
             time.sleep(1)
@@ -178,74 +245,188 @@ class PlottingThread(threading.Thread):
             while curr_thread:
                 curr_thread.join()
                 curr_thread = curr_thread.last_thread
+            
+            if self.stream:
+                #File is named by the start time of the sweep
+                name = time.strftime('%b-%d-%Y_%H-%M-%S', time.localtime())
+                self.writer = datafile.DataWriter(name, self.point_dict,
+                                                  self._sweepNames,
+                                                  [inst.name for inst in self.measInst],
+                                                  self._sweepDescription,
+                                                  streamSetpoints = bool(self.learner),
+                                                  order = self.order)
                 
-            #Different blocks for 2D vs 1D sweep, but intuitively seems
-            #unnecessary. Also makes it harder to modify, since have to modify
-            #both blocks. 
-            if self.sweep2D:
-                for i in range(len(x_data)):
-                    #Ramp x axis instrument
-                    self.inst1.ramp(x_data[i])
-                    for j in range(len(y_data)):
-                        if self.stopflag:
-                            
-                            #Only return plot if a point has already been measured
-                            if not np.isnan(self.point_dict[self.measInst[0].name]).all():
-                                #create another copy of the image because dynamic map object now exists in main thread
-                                img = update_fn()
-
-                                return img
-                            return
-                        if self.get_plot:
-                            #Used to get plot while its running
-                            img = update_fn()
-                            data = self.savegen(img)
-                            self.sendData(data)
-                            self.get_plot = False
-                        
-                        #Ramp y axis instrument
-                        self.inst2.ramp(y_data[j])
-                        
-                        #This wait necessary for instantaneous ramping and
-                        #measuring of instruments but for real
-                        #instruments + lock in there will inherently be a wait
-                        #time so probably not necessary there?
-                        time.sleep(.1)
-                        
-                        for inst in self.measInst:
-                            #For each measurement instrument provided measure
-                            self.point_dict[inst.name][j,i] = inst.measure()
-                        
-                        #Update DynamicMap with updated data (basically just
-                        #calls update_fn again)
-                        dmap.event()
-                img = update_fn()
-                return img
+            if self.concurrent and len(self.measInst) > 1:
+                self._pool = ThreadPoolExecutor(max_workers=len(self.measInst))
             
+            #Points that have been measured but not yet saved/plotted, as
+            #list of (index, end of line). This is done while the next point
+            #settles.
+            previous = None
+            
+            #Swept instruments and their setpoints, slowest first
+            axes = [(inst, self.point_dict[inst.name]) for inst in self.sweepInsts]
+            shape = tuple(len(setpoints) for inst, setpoints in axes)
+            if self.buffered:
+                #The fast axis is swept by the instrument itself, a full line
+                #for every point of the outer axes (see _measureLine)
+                fast, fast_setpoints = axes.pop()
+            
+            #Index into the setpoints each instrument is currently at
+            current = [None]*len(axes)
+            
+            #Same loop for any number of swept instruments, the order of
+            #points is given by the scan order (see scanorder.py), or picked
+            #from the data measured so far for adaptive sweeps (see
+            #adaptive.py)
+            if self.learner:
+                sequence = adaptive.sample(self.learner, self.point_dict,
+                                           self._sweepNames,
+                                           [inst.name for inst in self.measInst])
+            elif self.buffered:
+                sequence = ((point, point[::-1], True) for point in
+                            itertools.product(*(range(n) for n in shape[:-1])))
             else:
-                for i in range(len(x_data)):
-                    self.inst1.ramp(x_data[i])
-                    if self.stopflag:
-                        if not np.isnan(self.point_dict[self.measInst[0].name]).all():
-                            #create another copy of the image because
-                            #dynamic map object now exists in main thread
-                            img = update_fn()
-                            return img
-                        return
-                    if self.get_plot:
-                        #Used to get plot while its running
-                        img = update_fn()
-                        data = self.savegen(img)
-                        self.sendData(data)
-                        self.get_plot = False
-                    time.sleep(.1)
+                #Measured arrays are indexed in reverse order, ie [y, x]
+                sequence = ((point, point[::-1], lineEnd) for point, lineEnd
+                            in scanorder.scanOrder(self.order, shape))
+            for line, (point, index, lineEnd) in enumerate(sequence):
+                if self.stopflag:
+                    if previous:
+                        self._pointsDone(plot, previous)
                     
-                    for inst in self.measInst:
-                        self.point_dict[inst.name][i] = inst.measure()
-                    dmap.event()
-
-                img = update_fn()
-                return img
+                    #Only return plot if a point has already been measured
+                    plot.finish()
+                    if not np.isnan(self.point_dict[self.measInst[0].name]).all():
+                        #create another copy of the image because dynamic map object now exists in main thread
+                        img = plot.current()
+                        return img
+                    return
+                if self.get_plot:
+                    #Used to get plot while its running
+                    data = self.savegen()
+                    self.sendData(data)
+                    self.get_plot = False
+                
+                #Only ramp the instruments whose setpoint changes
+                started = []
+                for axis, (inst, setpoints) in enumerate(axes):
+                    if current[axis] != point[axis]:
+                        inst.ramp(setpoints[point[axis]])
+                        self._journal(inst, setpoints[point[axis]])
+                        started.append(self._settleStart(inst, setpoints, current[axis], point[axis]))
+                        current[axis] = point[axis]
+                if self.buffered:
+                    #Go to the start of the line before it is swept
+                    line_order = np.arange(shape[-1])
+                    if self.order == 'serpentine' and line % 2:
+                        line_order = line_order[::-1]
+                    fast.ramp(fast_setpoints[line_order[0]])
+                    self._journal(fast, fast_setpoints[line_order[0]])
+                    started.append(self._settleStart(fast, fast_setpoints, None, line_order[0]))
+                
+                #Save and plot the last point while waiting for the
+                #instruments to settle
+                if previous:
+                    self._pointsDone(plot, previous)
+                for settling in started:
+                    self._settleWait(settling)
+                
+                #For each measurement instrument provided measure
+                if self.buffered:
+                    previous = self._measureLine(index, line_order)
+                else:
+                    self._measureAll(index)
+                    previous = [(index, lineEnd)]
+            
+            if previous:
+                self._pointsDone(plot, previous)
+            plot.finish()
+            img = plot.current()
+            return img
+    
+    def _measureAll(self, index):
+        """Measures every measurement instrument and puts the results at the
+        given index of their arrays. Runs the instruments concurrently if
+        enabled, but results always go to the slot of their own instrument."""
+        if self._pool:
+            futures = [self._pool.submit(inst.measure) for inst in self.measInst]
+            for inst, future in zip(self.measInst, futures):
+                self.point_dict[inst.name][index] = future.result()
+        else:
+            for inst in self.measInst:
+                self.point_dict[inst.name][index] = inst.measure()
+    
+    def _measureLine(self, index, order):
+        """Sweeps the fast axis through a full line in hardware while the
+        measurement instruments acquire, and puts the lines at the given index
+        of their arrays. Returns list of (index, end of line) of the measured
+        points.
+        
+        Args:
+            index: Index of the line in the measured arrays, ie the index of
+                every axis except the fast one (first)
+            
+            order: Indices of the fast axis setpoints in the order they are
+                swept
+        """
+        fast = self.sweepInsts[-1]
+        setpoints = self.point_dict[fast.name][order]
+        for inst in self.measInst:
+            inst.armBuffered(len(order), self.buffered)
+        fast.bufferedLine(setpoints, self.buffered)
+        self._journal(fast, setpoints[-1])
+        for inst in self.measInst:
+            self.point_dict[inst.name][(order,) + index] = inst.readBuffered()
+        return [((i,) + index, n == len(order) - 1) for n, i in enumerate(order)]
+    
+    def _journal(self, inst, value):
+        """Records the ramp of a swept instrument in the journal of the
+        Measurement (see Measurement._journalRamp)"""
+        if self.MeasurementRef is not None:
+            self.MeasurementRef._journalRamp([inst], [value])
+    
+    def _settleStart(self, inst, setpoints, previous, index):
+        """Starts the settle policy of a swept instrument that was just ramped
+        from setpoints[previous] to setpoints[index]. Returns (instrument,
+        policy, deadline) to be passed to _settleWait."""
+        policy = settle.policyFor(inst, self.settle)
+        if previous is None:
+            previous_value = None
+        else:
+            previous_value = setpoints[previous]
+        return (inst, policy, policy.start(inst, previous_value, setpoints[index]))
+    
+    def _settleWait(self, started):
+        """Blocks until the instrument started by _settleStart has settled"""
+        inst, policy, deadline = started
+        policy.wait(inst, deadline)
+    
+    def _pointsDone(self, plot, points):
+        """Saves and plots a list of (index, end of line) of measured points
+        (see _pointDone)"""
+        for index, lineDone in points:
+            self._pointDone(plot, index, lineDone)
+    
+    def _pointDone(self, plot, index, lineDone):
+        """Saves (if streaming) and plots a measured point
+        
+        Args:
+            plot: LivePlot of the sweep
+            
+            index: Index of the point in the measured arrays
+            
+            lineDone: Whether this is the last point of a fast-axis line
+        """
+        if self.writer:
+            self.writer.mark(index)
+        
+        #Update DynamicMap with updated data (if it is time to redraw)
+        plot.point(index)
+        if lineDone:
+            if self.writer:
+                self.writer.lineDone()
+            plot.lineDone()
             
     def sendData(self, data):
         """Put data into queue as only object, by first repeatedly pulling from
@@ -268,13 +449,21 @@ class PlottingThread(threading.Thread):
         """This defines what the thread does when started. First starts the
         measurement function, and when finished returns the finished plot, puts
         it into the savedData object, and puts the object in the queue for the
-        main thread to retrieve. Finally it saves the object into a pickle
-        format to be read earlier. The measure function itself sends the empty
+        main thread to retrieve. Finally it saves the object into an HDF5
+        file to be read later. The measure function itself sends the empty
         plot to the main thread which is then updated.
         """
-        img = self.measure()
+        try:
+            img = self.measure()
+        finally:
+            #Make sure everything measured so far is on disk, even if the
+            #sweep failed
+            if self.writer:
+                self.writer.close()
+            if self._pool:
+                self._pool.shutdown()
         if img:
-            data = self.savegen(img)
+            data = self.savegen(self.writer.name if self.writer else None)
             self.sendData(data)
             #print(data.state)
             self.save(data)
@@ -300,13 +489,15 @@ class PlottingOverview():
 	#currently running sweep)
     plot_thread = None
     
-    def _sweep(self, inst1, measInst, points, MeasurementRef, inst2 = None):
+    def _sweep(self, sweepInsts, measInst, points, MeasurementRef, **options):
         """Creates and starts PlottingThread with instruments to be swept.
         Returns the DynamicMap the thread puts into a queue, such that main
         thread can display.
         
         Args:
-            inst1: Instrument to be swept on x-axis
+            sweepInsts: List of instruments to be swept, outermost first. For
+                a 2D sweep these are the instruments on the x-axis and y-axis
+                (fast axis).
             
             measInst: Intrument (or list of instruments) to be measured
             
@@ -316,7 +507,8 @@ class PlottingOverview():
             MeasurementRef: Reference to Measurement Overview object (defined in measure.py).
                 Used to extract metadata of current state of system when sweep has finished.
             
-            inst2: Instrument to be swept on y-axis (fast axis) for a 2D sweep
+            options: Further keyword arguments are passed on to the
+                PlottingThread (such as stream or refreshInterval)
         """
         #Create new queue, since old one might still have data that was never retrieved
         self.q = queue.Queue()
@@ -327,13 +519,15 @@ class PlottingOverview():
   
         if self.plot_thread and self.plot_thread.isAlive():
             self.plot_thread = PlottingThread(self.thread_count, points, self.q,
-                                            self.retrieval_queue, inst1,
-                                            measInst, MeasurementRef, inst2,
-                                            lthread = self.plot_thread)
+                                            self.retrieval_queue, sweepInsts,
+                                            measInst, MeasurementRef,
+                                            lthread = self.plot_thread,
+                                            **options)
         else:
             self.plot_thread = PlottingThread(self.thread_count, points, self.q,
-                                            self.retrieval_queue, inst1,
-                                            measInst, MeasurementRef, inst2)
+                                            self.retrieval_queue, sweepInsts,
+                                            measInst, MeasurementRef,
+                                            **options)
         
         #Increase thread count so next thread has different ID
         self.thread_count += 1
@@ -3,6 +3,8 @@
 
 import serial
 import time
+import contextlib
+import numpy as np
 
 class Waveform:
     # Enum-like class defining the built-in waveform types
@@ -34,6 +36,7 @@ class qdac():
     channelNumbers = range(1,49)
     noChannel = 0
     syncChannels = [1, 2, 3, 4, 5]
+    batchWindow = 16 # Max number of commands in a batch sent ahead of their replies
 
     def __init__(self, port, verbose=False):
         # Constructor
@@ -43,10 +46,16 @@ class qdac():
         self.verbose = verbose
         self.voltageRange = {ch: 10.0 for ch in qdac.channelNumbers} # Assumes that QDAC has power-on values
         self.currentRange = {ch: 100e-6 for ch in qdac.channelNumbers} # Assumes that QDAC has power-on values
+        self._rxBuffer = bytearray() # Received bytes not yet returned by _readLine
+        self._batch = None # Commands collected inside a batch context
+        self._awgLoaded = None # Upload commands of the waveform currently in the AWG
+        self._awgBatched = None # Upload commands collected inside a batch context, not sent yet
 
     def __enter__(self):
         self.sport = serial.Serial(port=self.port, baudrate=460800, bytesize=serial.EIGHTBITS,
                                    parity=serial.PARITY_NONE, stopbits=serial.STOPBITS_ONE, timeout=0.5)
+        self._rxBuffer = bytearray()
+        self._awgLoaded = None
         return self
 
     def __exit__(self, type, value, traceback):
@@ -85,6 +94,24 @@ class qdac():
         self._validateVoltage(channel, volts)
         self._sendReceive("set %d %f" % (channel, volts))
 
+    def getDCVoltage(self, channel):
+        # Read the DC voltage a QDAC channel is set to. Unit is V
+        self._validateChannel(channel)
+        reply = self._sendReceive("set %d" % channel)
+        return self._parseDCVoltage(reply)
+
+    def getDCVoltages(self, channels):
+        # Read the DC voltages of several QDAC channels in one batch (see sendBatch). Unit is V
+        for channel in channels:
+            self._validateChannel(channel)
+        replies = self.sendBatch(["set %d" % channel for channel in channels])
+        return [self._parseDCVoltage(reply) for reply in replies]
+
+    @staticmethod
+    def _parseDCVoltage(reply):
+        # The voltage is the last value of the reply, with or without its unit
+        return float(reply.split(":", 1)[-1].strip().rstrip("V"))
+
     def setCalibrationChannel(self, channel):
         # Connect a QDAC channel to the Calibration output. Useful for testing the output performance
         # Set channel to 0 to disconnect all channels from the Calibration output
@@ -139,16 +166,35 @@ class qdac():
             raise Exception("Invalid number of repetitions: %d" % repetitions)
         self._sendReceive("pul %d %d %f %f %d" % (lowDuration, highDuration, lowVolts, highVolts, repetitions))
 
-    def defineAWGraw(self, samples, repetitions=-1): # Sample rate is 1kS/s
+    def defineAWGraw(self, samples, repetitions=-1, run=True): # Sample rate is 1kS/s
         # Define a pulse train function generator
         # The generator is always Generator.AWG
         # samples: An array of volt, defines the pulsetrain samples at 1000 samples per second. Max 8000 samples allowed
         # repetitions: How many times the waveform is repeated. -1 means infinite
-        if len(samples) == 0 or len(samples) > 8000:
+        # run: Start the waveform right away. If False, start it later with runAWG
+        # Samples are sent with 6 decimals, like setDCVoltage. A waveform identical to the one
+        # already in the AWG is not uploaded again
+        samples = np.asarray(samples, dtype=float)
+        if samples.ndim != 1 or len(samples) == 0 or len(samples) > 8000:
             raise Exception("Invalid number of samples in AWG definition")
-        for idx in range(0, len(samples), 64):
-            cmd = "awg 0 0 " + " ".join([str(v) for v in samples[idx:idx+64]])
-            self._sendReceive(cmd)
+        if not np.all(np.abs(samples) <= 10.0):
+            raise Exception("Invalid AWG sample: %s" % samples[~(np.abs(samples) <= 10.0)][0])
+        cmds = ["awg 0 0 " + chunk.decode("ascii") for chunk in _encodeSamples(samples, 64)]
+        if cmds != self._awgLoaded:
+            self._awgLoaded = None # In case the upload fails halfway
+            if self._batch is not None:
+                # Only loaded once the batch is sent and its replies are checked
+                self._awgBatched = cmds
+                self.sendBatch(cmds)
+            else:
+                self.sendBatch(cmds)
+                self._awgLoaded = cmds
+        if run:
+            self.runAWG(repetitions)
+
+    def runAWG(self, repetitions=-1):
+        # Start the waveform defined by defineAWGraw
+        # repetitions: How many times the waveform is repeated. -1 means infinite
         self._sendReceive("run %d" % repetitions)
 
     def setChannelOutput(self, channel, generator, amplitude=1.0, offset=0):
@@ -207,6 +253,61 @@ class qdac():
             if timeout > 0 and time.time() - beginTime > timeout:
                 return False
 
+    def sendBatch(self, msgs):
+        # Send several commands back-to-back and collect their replies in order
+        # Up to batchWindow commands are sent ahead of their replies, so a batch takes about one
+        # round trip instead of one per command
+        # Returns the list of replies. Raises an exception if a command gets no reply, or an error
+        # reply. After an error no further commands are sent
+        msgs = list(msgs)
+        if self._batch is not None:
+            # Part of the batch context, sent when it exits
+            self._batch.extend(msgs)
+            return [""]*len(msgs)
+        replies = []
+        sent = 0
+        error = None
+        while len(replies) < sent or (error is None and len(replies) < len(msgs)):
+            if error is None:
+                ahead = msgs[sent:len(replies) + qdac.batchWindow]
+                if ahead:
+                    self._write(ahead)
+                    sent += len(ahead)
+            reply = self._readLine(failOnTimeout=False)
+            if not reply:
+                raise Exception("No reply to command: %s" % msgs[len(replies)])
+            if error is None and reply.startswith("Error"):
+                # Commands already sent are still answered, so their replies are read first
+                error = "Command %s failed: %s" % (msgs[len(replies)], reply)
+            replies.append(reply)
+        if error is not None:
+            raise Exception(error)
+        return replies
+
+    @contextlib.contextmanager
+    def batch(self):
+        # Context manager that collects the commands of all calls inside it, and sends them as one
+        # batch (see sendBatch) when it exits. Only use for calls that do not need the reply,
+        # such as setDCVoltage or setChannelOutput
+        # Example:
+        #   with q.batch():
+        #       q.setDCVoltage(1, 0.1)
+        #       q.setDCVoltage(2, 0.2)
+        if self._batch is not None:
+            # Nested batches are part of the outer one
+            yield self
+            return
+        self._batch = []
+        try:
+            yield self
+            msgs = self._batch
+        finally:
+            self._batch = None
+            awgBatched, self._awgBatched = self._awgBatched, None
+        self.sendBatch(msgs)
+        if awgBatched is not None:
+            self._awgLoaded = awgBatched
+
     def _validateChannel(self, channel):
         if channel not in qdac.channelNumbers:
             raise Exception("Invalid channel number %d" % channel)
@@ -216,28 +317,76 @@ class qdac():
             raise Exception("Invalid voltage %f" % volts)
 
     def _sendReceive(self, msg):
-        if self.verbose:
-            print(msg)
-        self.sport.write(msg + "\n")
+        if self._batch is not None:
+            # Sent when the batch exits
+            self._batch.append(msg)
+            return ""
+        self._write([msg])
         reply = self._readLine()
         return reply
 
+    def _write(self, msgs):
+        # Write commands to the port in one call
+        if self.verbose:
+            for msg in msgs:
+                print(msg)
+        self.sport.write("".join(msg + "\n" for msg in msgs).encode("ascii"))
+
     def _readLine(self, failOnTimeout=True):
-        out = ""
-        c = ""
+        # Returns the next line received from the QDAC, without the line ending
+        # Reads everything the port has received in one call instead of byte by byte.
+        # Bytes after the line ending are kept for the next call
         while True:
-            c = self.sport.read(1)
-            if c:
-                if c != "\n":
-                    out += c
-                else:
-                    break
+            end = self._rxBuffer.find(b"\n")
+            if end >= 0:
+                line = self._rxBuffer[:end]
+                del self._rxBuffer[:end + 1]
+                break
+            # Blocks until at least one byte arrives or the port times out
+            chunk = self.sport.read(max(1, self.sport.in_waiting))
+            if chunk:
+                self._rxBuffer += chunk
             else:
                 if failOnTimeout and self.verbose:
                     raise Exception("Timeout!")
+                line = self._rxBuffer
+                self._rxBuffer = bytearray()
                 break
+        out = line.decode("ascii", errors="replace")
         if self.verbose and out:
             print(out)
         return out
 
 
+def _encodeSamples(samples, chunk):
+    # Format an array of voltages (at most 10 V) with 6 decimals as ASCII text, for the whole
+    # array at once instead of per float. Returns a list of byte strings of chunk samples each,
+    # separated by spaces. Each sample is first written as fixed width "-10.000000 " and a mask
+    # then drops the unneeded sign, leading digit and trailing zeros
+    micro = np.rint(np.abs(samples)*1e6).astype(np.int64)
+    units = micro // 1000000
+    fraction = micro % 1000000
+    chars = np.empty((len(samples), 11), dtype=np.uint8)
+    chars[:, 0] = ord("-")
+    chars[:, 1] = ord("0") + units // 10
+    chars[:, 2] = ord("0") + units % 10
+    chars[:, 3] = ord(".")
+    for i in range(6):
+        chars[:, 4 + i] = ord("0") + fraction // 10**(5 - i) % 10
+    chars[:, 10] = ord(" ")
+    keep = np.ones(chars.shape, dtype=bool)
+    keep[:, 0] = (samples < 0) & (micro > 0)
+    keep[:, 1] = units >= 10
+    # Number of decimals needed, no decimal point if there are none
+    decimals = np.full(len(samples), 6)
+    for i in range(6):
+        decimals[fraction % 10**(i + 1) == 0] = 5 - i
+    keep[:, 3] = decimals > 0
+    keep[:, 4:10] = np.arange(6) < decimals[:, None]
+    flat = chars[keep].tobytes()
+    # Cut at the end of every chunk, without the trailing space
+    ends = np.cumsum(keep.sum(axis=1))[chunk - 1::chunk].tolist()
+    if len(samples) % chunk:
+        ends.append(len(flat))
+    starts = [0] + ends[:-1]
+    return [flat[start:end - 1] for start, end in zip(starts, ends)]
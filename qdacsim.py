@@ -0,0 +1,340 @@
+import os
+import sys
+import tty
+import time
+import queue
+import select
+import threading
+import collections
+import numpy as np
+
+#Simulated QDAC for testing and benchmarking without the instrument. The
+#simulator opens a pseudo-terminal and answers the line protocol used by
+#qdac.qdac on it, so the driver (and qdacWrapper) can be pointed at its port
+#like at the real serial port:
+#
+#    with QdacSimulator(latency=.001) as sim:
+#        with qdac.qdac(sim.port) as q:
+#            q.setDCVoltage(1, .1)
+#
+#Commands are answered in order, each after its latency (plus the time the
+#QDAC is busy with earlier commands), and with a baudrate the time to transmit
+#every command and reply over the serial line is added.
+#Running this file benchmarks the driver against the simulator.
+
+#Size of a byte on the serial line in bits (8N1)
+BITS_PER_BYTE = 10
+
+class QdacSimulator:
+    """Simulated QDAC on a pseudo-terminal. Keeps track of the state set by
+    commands (DC voltages, outputs, generators, AWG waveform and sync
+    outputs) so that it can be checked after running driver code.
+
+    The AWG collects the samples of all awg commands, and a run command
+    starts the collected samples as the new waveform. A run without new
+    samples repeats the previous waveform. Once its repetitions are done the
+    AWG holds its last sample, which a channel switched to the AWG outputs
+    (scaled by its amplitude, on top of its offset) until the AWG is run
+    again. A channel switched back to DC outputs the DC voltage it was last
+    set to, like the real QDAC.
+    """
+    #Power-on values
+    temperature = 30.
+
+    def __init__(self, latency=0, baudrate=None, latencies=None, commandTime=0,
+                 historyLength=100000):
+        """
+        Args:
+            latency: (default=0) Time in seconds from receiving a command to
+                sending its reply, such as the latency of a USB serial
+                adapter. Commands sent ahead of the replies to earlier ones
+                overlap their latency.
+
+            baudrate: (Optional) Baudrate of the simulated serial line. If
+                given, sending commands and replies takes as long as on a
+                serial line of this baudrate. The default transmits
+                instantly.
+
+            latencies: (Optional) Dictionary of {command: latency} for commands
+                with a different latency, such as {'awg': .005}
+
+            commandTime: (default=0) Time in seconds the QDAC is busy with
+                each command. Unlike latency this does not overlap, since
+                commands are executed one after the other. The state only
+                changes once a command is executed, so the outputs between
+                the commands of a batch can be checked.
+
+            historyLength: (default=100000) Number of most recent commands kept
+                in history
+        """
+        self.latency = latency
+        self.baudrate = baudrate
+        self.latencies = latencies or {}
+        self.commandTime = commandTime
+        self.history = collections.deque(maxlen=historyLength)
+
+        self.voltages = {ch: 0. for ch in range(1, 49)}
+        self.currents = {ch: 0. for ch in range(1, 49)}
+        self.voltageRange = {ch: 10. for ch in range(1, 49)}
+        self.currentRange = {ch: 100e-6 for ch in range(1, 49)}
+        #(generator, amplitude, offset) of each channel
+        self.outputs = {ch: (0, 1., 0.) for ch in range(1, 49)}
+        #(generator, delay, pulseLength) of each sync output
+        self.syncOutputs = {ch: (0, 0, 0) for ch in range(1, 6)}
+        self.functionGenerators = {}
+        self.pulsetrain = None
+        self.awgSamples = []
+        self.awgRepetitions = 0
+        self._awgPending = []
+        #Time (as time.perf_counter()) at which each generator was started
+        self._started = {}
+        self._waitingSync = []
+
+        self._master = None
+        self._slave = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._replies = queue.Queue()
+
+        self._handlers = {'set': self._set, 'get': self._get, 'vol': self._vol,
+                          'cur': self._cur, 'fun': self._fun, 'pul': self._pul,
+                          'awg': self._awg, 'run': self._run, 'wav': self._wav,
+                          'syn': self._syn, 'ssy': self._ssy, 'tem': self._tem,
+                          'cal': self._cal}
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.stop()
+
+    @property
+    def port(self):
+        """Name of the serial port to open, to be given to qdac.qdac"""
+        return os.ttyname(self._slave)
+
+    def start(self):
+        """Opens the pseudo-terminal and starts answering commands"""
+        self._master, self._slave = os.openpty()
+        tty.setraw(self._master)
+        tty.setraw(self._slave)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._receive, daemon=True)
+        self._thread.start()
+        threading.Thread(target=self._transmit, daemon=True).start()
+
+    def stop(self):
+        """Stops answering commands and closes the pseudo-terminal"""
+        self._stop.set()
+        self._replies.put(None)
+        self._thread.join()
+        os.close(self._master)
+        os.close(self._slave)
+
+    def voltage(self, channel):
+        """Returns the voltage the channel outputs right now, including the
+        AWG waveform if the channel follows the AWG"""
+        generator, amplitude, offset = self.outputs[channel]
+        if generator == 0:
+            return self.voltages[channel]
+        if generator == 9:
+            return amplitude*self.awgSample() + offset
+        return offset
+
+    def awgSample(self):
+        """Returns the sample the AWG outputs right now, which is 0 before it
+        is first run"""
+        if not self.awgSamples or 9 not in self._started:
+            return 0.
+        #Holds the last sample once the repetitions are done
+        sample = int((time.perf_counter() - self._started[9])*1000)
+        if self.awgRepetitions >= 0:
+            sample = min(sample, len(self.awgSamples)*self.awgRepetitions - 1)
+        return self.awgSamples[sample % len(self.awgSamples)]
+
+    def _receive(self):
+        """Reads commands and schedules their replies. A command is executed
+        once it is received and the previous command is done, which takes
+        commandTime. Its reply is sent latency later, but not before the
+        reply to the previous command has been sent."""
+        buffer = b''
+        received = done = sent = 0
+        while not self._stop.is_set():
+            ready, _, _ = select.select([self._master], [], [], .05)
+            if not ready:
+                continue
+            buffer += os.read(self._master, 65536)
+            now = time.perf_counter()
+            while b'\n' in buffer:
+                line, buffer = buffer.split(b'\n', 1)
+                received = max(received, now) + self._transmitTime(len(line) + 1)
+                command = line.decode('ascii', errors='replace').strip()
+                if not command:
+                    continue
+                name = command.split()[0]
+                done = max(received, done) + self.commandTime
+                due = done + self.latencies.get(name, self.latency)
+                remaining = done - time.perf_counter()
+                if remaining > 0:
+                    time.sleep(remaining)
+                for reply in self._execute(command):
+                    sent = max(due, sent) + self._transmitTime(len(reply) + 1)
+                    self._replies.put((sent, reply))
+
+    def _transmit(self):
+        """Writes the replies to the pseudo-terminal once they are due"""
+        while True:
+            item = self._replies.get()
+            if item is None:
+                return
+            due, reply = item
+            remaining = due - time.perf_counter()
+            if remaining > 0:
+                time.sleep(remaining)
+            try:
+                os.write(self._master, reply.encode('ascii') + b'\n')
+            except OSError:
+                return
+
+    def _transmitTime(self, size):
+        if not self.baudrate:
+            return 0
+        return size*BITS_PER_BYTE/self.baudrate
+
+    def _execute(self, command):
+        """Updates the state for a command and returns list of reply lines"""
+        self.history.append(command)
+        name, *args = command.split()
+        handler = self._handlers.get(name)
+        if handler is None:
+            return ['Error: Unknown command %s' % (name,)]
+        try:
+            reply = handler(*args)
+        except (TypeError, ValueError, KeyError):
+            return ['Error: Invalid arguments %s' % (command,)]
+        replies = [reply]
+        #Pulse of sync outputs waited for with ssy
+        for generator in list(self._waitingSync):
+            if generator in self._started:
+                self._waitingSync.remove(generator)
+                replies.append('#%d' % (generator,))
+        return replies
+
+    def _set(self, channel, volts=None):
+        channel = int(channel)
+        if volts is None:
+            return 'Output voltage channel %d: %f V' % (channel, self.voltages[channel])
+        volts = float(volts)
+        if abs(volts) > self.voltageRange[channel]:
+            raise ValueError(volts)
+        self.voltages[channel] = volts
+        return 'Output voltage channel %d set to %f V' % (channel, volts)
+
+    def _get(self, channel):
+        return 'Current: %.3fuA' % (self.currents[int(channel)]*1e6,)
+
+    def _vol(self, channel, range):
+        self.voltageRange[int(channel)] = 1. if int(range) == 1 else 10.
+        return 'Voltage range channel %s set to %s V' % (channel, range)
+
+    def _cur(self, channel, range):
+        self.currentRange[int(channel)] = float(range)
+        return 'Current range channel %s set to %s' % (channel, range)
+
+    def _fun(self, generator, waveform, period, dutycycle, repetitions):
+        generator = int(generator)
+        self.functionGenerators[generator] = (int(waveform), int(period),
+                                              int(dutycycle), int(repetitions))
+        self._started[generator] = time.perf_counter()
+        return 'Function generator %d defined' % (generator,)
+
+    def _pul(self, lowDuration, highDuration, lowVolts, highVolts, repetitions):
+        self.pulsetrain = (int(lowDuration), int(highDuration), float(lowVolts),
+                           float(highVolts), int(repetitions))
+        self._started[10] = time.perf_counter()
+        return 'Pulsetrain defined'
+
+    def _awg(self, channel, start, *samples):
+        self._awgPending.extend(float(v) for v in samples)
+        return 'AWG %d samples received' % (len(samples),)
+
+    def _run(self, repetitions):
+        if self._awgPending:
+            self.awgSamples = self._awgPending
+            self._awgPending = []
+        self.awgRepetitions = int(repetitions)
+        self._started[9] = time.perf_counter()
+        return 'AWG started with %d samples' % (len(self.awgSamples),)
+
+    def _wav(self, channel, generator, amplitude, offset):
+        channel = int(channel)
+        self.outputs[channel] = (int(generator), float(amplitude), float(offset))
+        return 'Output channel %d set to generator %s' % (channel, generator)
+
+    def _syn(self, syncChannel, generator, delay, pulseLength):
+        self.syncOutputs[int(syncChannel)] = (int(generator), int(delay), int(pulseLength))
+        return 'Sync output %s set to generator %s' % (syncChannel, generator)
+
+    def _ssy(self, generator):
+        #Answered with # right away if the generator is running, otherwise
+        #once it is started
+        generator = int(generator)
+        self._waitingSync.append(generator)
+        return 'Waiting for sync of generator %d' % (generator,)
+
+    def _tem(self, board, position):
+        return 'Temperature: %.3f' % (self.temperature,)
+
+    def _cal(self, channel):
+        return 'Calibration output set to channel %s' % (channel,)
+
+def benchmark(latency=.001, baudrate=460800, repeats=5):
+    """Times common driver operations against the simulator and prints the
+    best time of each
+
+    Args:
+        latency: (default=.001) Latency of the simulated QDAC in seconds
+
+        baudrate: (default=460800) Baudrate of the simulated serial line,
+            same as the real QDAC
+
+        repeats: (default=5) Number of times each operation is timed
+    """
+    import qdac
+    operations = [('48 x setDCVoltage', _setAll),
+                  ('48 x setDCVoltage in batch', _setAllBatch),
+                  ('48 x getADCreading', _readAll),
+                  ('8000 sample AWG upload', _uploadAWG)]
+    print('Latency %s s, baudrate %s' % (latency, baudrate))
+    with QdacSimulator(latency=latency, baudrate=baudrate) as sim:
+        with qdac.qdac(sim.port) as q:
+            for name, operation in operations:
+                best = np.inf
+                for _ in range(repeats):
+                    start = time.perf_counter()
+                    operation(q)
+                    best = min(best, time.perf_counter() - start)
+                print('%-30s %8.2f ms' % (name, best*1e3))
+
+def _setAll(q):
+    for channel in range(1, 49):
+        q.setDCVoltage(channel, .1)
+
+def _setAllBatch(q):
+    with q.batch():
+        _setAll(q)
+
+def _readAll(q):
+    for channel in range(1, 49):
+        q.getADCreading(channel)
+
+def _uploadAWG(q):
+    #Uploads every time instead of reusing the loaded waveform
+    q._awgLoaded = None
+    q.defineAWGraw(np.linspace(-1, 1, 8000), repetitions=1)
+
+if __name__ == '__main__':
+    #python qdacsim.py [latency] [baudrate]
+    args = [float(arg) for arg in sys.argv[1:3]]
+    benchmark(*args)
@@ -1,8 +1,11 @@
 import qdac
+import time
+import contextlib
 import numpy as np
 import pandas as pd
 from IPython.display import display
 from gui import GUI
+import statusboard
 
 class qdacChannel:
     def __init__(self, qdac, number, gui, name, _qdacwrapper):
@@ -42,19 +45,90 @@ class qdacChannel:
     def __repr__(self):
         return 'QDAC Channel %s' % (self.number,)
     
+    #Limits of how fast this channel is ramped (see qdacWrapper._rampChannels).
+    #slewRate is the maximum rate in V/s (None for no limit), and maxStep the
+    #largest step in V (None to use the maxStep of the qdacWrapper).
+    slewRate = None
+    maxStep = None
+    
     def ramp(self, voltage):
-        """Ramps this channel to the given voltage (V)
+        """Ramps this channel to the given voltage (V), limited by its
+        slewRate and maxStep (see qdacWrapper._rampChannels)
         
         Args:
             voltage: Voltage (in Volts) to ramp to
         """
-        #Uncomment below when actually connected to qdac
-        #self.qdacInst.setDCVoltage(channel = number, volts = voltage)
+        self._qdacWrapper._rampChannels([self], [voltage])
+    
+    def _set(self, voltage):
+        """Sets the output of this channel immediately, without updating the
+        displayed voltage (see qdacWrapper._rampChannels)"""
+        if self._qdacWrapper.connected:
+            self.qdacInst.setDCVoltage(channel = self.number, volts = voltage)
         self.voltage = voltage
-        self._qdacWrapper.voltage_dict[self.number] = voltage
         
-        #Location of gui is (channel #, 2) -- 2 is for column of voltages
-        self.display_voltage([self.number, 2], voltage)
+    def bufferedLine(self, setpoints, interval=.001):
+        """Sweeps this channel through a line of setpoints timed by the QDAC
+        itself, by uploading the line as an AWG waveform. The sync output
+        syncChannel of the qdacWrapper pulses when the line starts, which
+        should be used to trigger the measurement instruments. Blocks until
+        the line is finished and leaves the channel at the last setpoint.
+        
+        The channel is switched to the AWG with amplitude 0 at its current
+        voltage, so it does not jump to whatever sample the AWG holds before
+        the line starts. Switching back to DC is unavoidably followed by a
+        brief glitch to the previous DC level, until the last setpoint is set
+        in the same batch, since DC voltages can only be set while the channel
+        outputs DC.
+        
+        Args:
+            setpoints: Voltages (in Volts) of the line
+            
+            interval: (default=.001) Time in seconds per setpoint. Must be a
+                multiple of the AWG sample time (1 ms).
+        """
+        self.checkBuffered(len(setpoints), interval)
+        samplesPerPoint = int(round(interval*self._qdacWrapper.awgRate))
+        samples = np.repeat(setpoints, samplesPerPoint)
+        
+        self.qdacInst.setSyncOutput(self._qdacWrapper.syncChannel, qdac.Generator.AWG)
+        #The channel only follows the AWG once the whole line is uploaded
+        self.qdacInst.defineAWGraw(samples, repetitions=1, run=False)
+        with self.qdacInst.batch():
+            self.qdacInst.setChannelOutput(self.number, qdac.Generator.AWG,
+                                           0, self.voltage)
+            self.qdacInst.runAWG(1)
+            self.qdacInst.setChannelOutput(self.number, qdac.Generator.AWG, 1, 0)
+        time.sleep(len(samples)/self._qdacWrapper.awgRate)
+        
+        #Hold the last value of the line
+        with self.qdacInst.batch():
+            self.qdacInst.setChannelOutput(self.number, qdac.Generator.DC)
+            self.qdacInst.setDCVoltage(self.number, setpoints[-1])
+        self.voltage = setpoints[-1]
+        self._qdacWrapper._updateVoltages([self], [self.voltage])
+        self._qdacWrapper._journal([self], [self.voltage])
+    
+    def checkBuffered(self, length, interval):
+        """Raises an exception if a line cannot be swept by bufferedLine.
+        Measurement.sweepND calls this before the sweep starts, such that
+        nothing is ramped for a sweep that would fail.
+        
+        Args:
+            length: Number of setpoints of the line
+            
+            interval: Time in seconds per setpoint
+        """
+        wrapper = self._qdacWrapper
+        if not wrapper.connected:
+            raise Exception("%s is not connected to a QDAC" % (self.name,))
+        samplesPerPoint = interval*wrapper.awgRate
+        if samplesPerPoint < 1 or not np.isclose(samplesPerPoint, round(samplesPerPoint)):
+            raise Exception("Interval %s is not a multiple of the AWG sample time (%s s)"
+                            % (interval, 1/wrapper.awgRate))
+        if length*round(samplesPerPoint) > wrapper.awgSamples:
+            raise Exception("Line of %d points at %s s per point does not fit in the %d AWG samples"
+                            % (length, interval, wrapper.awgSamples))
         
     def display_voltage(self, loc, value):
         """Sends a value to be displayed by associated Tkinter gui.
@@ -70,35 +144,115 @@ class qdacChannel:
         """
         self.guiDisplay.submit_to_tkinter(loc, np.round(value,6))
     
+    @property
+    def parent(self):
+        """qdacWrapper this channel belongs to. Measurement.ramp uses this to
+        ramp several channels of the same QDAC together."""
+        return self._qdacWrapper
+    
     @property
     def name(self):
         return self._name
     
     @name.setter
     def name(self, name):
-        self._qdacWrapper.channel_mapping[name] = self._qdacWrapper.channel_mapping.pop(self.name)
-        self._name = name
-        loc = [self.number, 1]
-        self.guiDisplay.update_name(loc, name)
+        self._qdacWrapper._renameChannel(self, name)
     
 class qdacWrapper:
     """Wrapper class for QDevil QDAC. Manages each individual channel through a
     dictionary. Important aspects are the _multiChannel property and snapshot
     method. Most of the other methods are now redundant by the way the Measure
     class works and I should remove."""
-    location = '/dev/ttyUSB0'
-    qdacInst= 1
+    location = None
+    qdacInst = None
     name = 'qdac'
     _multiChannel = True
+    #snapshot is cached here and always up to date, so Measurement does not
+    #need to cache it (see Measurement.getState)
+    _snapshotCached = True
+    #journal.Journal recording the voltage each channel is ramped to. Set by
+    #Measurement.addInstrument
+    journal = None
+    
+    #Sync output that triggers measurement instruments for buffered sweeps
+    #(see qdacChannel.bufferedLine)
+    syncChannel = 1
+    #Samples per second of the QDAC AWG
+    awgRate = 1000
+    
+    #Largest voltage step (V) of any channel in one increment of a ramp, and
+    #time (s) to wait between increments
+    maxStep = .01
+    stepDelay = 0
     
+    #Ramps that take at least this long (s) because of the slew rate of the
+    #channels are run on the QDAC AWG instead of stepped from Python, which
+    #holds at most awgSamples samples
+    hardwareRampTime = .1
+    awgSamples = 8000
+    #Time (s) per ramped channel the AWG waveform holds its start before it
+    #ramps, which covers sending the commands that start the ramp
+    awgLead = .002
     
-    def __init__(self):
+    
+    def __init__(self, qdacInst = None, location = None, display = 'window'):
+        """
+        Args:
+            qdacInst: (Optional) Opened qdac.qdac object to send commands to.
+                Without it (or location), channel voltages are only tracked
+                and displayed.
+            
+            location: (Optional) Serial port of the QDAC (such as
+                '/dev/ttyUSB0', or the port of a qdacsim.QdacSimulator) to
+                open when no qdacInst is given. Closed again by close.
+            
+            display: (default='window') How the name and voltage of each
+                channel are displayed:
+                'window': Tkinter window run by a thread of this process
+                    (see gui.py)
+                'shared': Published to shared memory, and shown by a viewer
+                    started separately with python statusboard.py (see
+                    statusboard.py). Also works without a display.
+                None: Not displayed
+        """
+        self._opened = False
+        if qdacInst is None and location is not None:
+            qdacInst = qdac.qdac(location).__enter__()
+            self._opened = True
+        if qdacInst is not None:
+            self.qdacInst = qdacInst
+            self.location = getattr(qdacInst, 'port', location)
         
-        self.guiDisplay = GUI()
+        if display == 'window':
+            self.guiDisplay = GUI()
+        elif display == 'shared':
+            self.guiDisplay = statusboard.StatusPublisher()
+        elif display is None:
+            self.guiDisplay = statusboard.NoDisplay()
+        else:
+            raise Exception("Unknown display %s, use 'window', 'shared' or None" % (display,))
         self.guiDisplay.start()
         
         self.channel_mapping = {'qdac%s' % (n,):qdacChannel(qdac = self.qdacInst, number = n, gui = self.guiDisplay, name= 'qdac%s' % (n,), _qdacwrapper = self) for n in range(1,49)}
         self.voltage_dict = {n: 0 for n in range(1,49)}
+        if self.connected:
+            #Channels keep their voltage while the QDAC is not connected, so
+            #ramps have to start from the voltage it is actually set to
+            channels = list(self.channel_mapping.values())
+            values = self.qdacInst.getDCVoltages([channel.number for channel in channels])
+            for channel, value in zip(channels, values):
+                channel.voltage = value
+            self._updateVoltages(channels, values)
+        
+        #Reverse of channel_mapping, {number: name}. Both are updated
+        #whenever a channel is renamed (see _renameChannel)
+        self._channelNames = {channel.number: name for name, channel in self.channel_mapping.items()}
+        #Functions called as listener(oldName, newName, channel) when a
+        #channel is renamed, such that Measurement can keep its names up to date
+        self._nameListeners = []
+        
+        #DataFrame returned by snapshot, rebuilt after voltages or names change
+        self._snapshot = None
         
         return
     
@@ -113,15 +267,31 @@ class qdacWrapper:
         chan_name = self._getName(channel)
         print("Overriding %s = Channel %s to %s = Channel %s" % (chan_name, channel, name, channel))
         
-        self.channel_mapping[name] = self.channel_mapping.pop(chan_name) #Deletes old entry for name that corresponded to given channel
-        self.channel_mapping[name]._name = name
+        self._renameChannel(self.channel_mapping[chan_name], name)
+        return
+    
+    def _renameChannel(self, channel, name):
+        """Renames a channel, updating both channel_mapping and the reverse
+        index _channelNames, and notifies the name listeners
+        
+        Args:
+            channel: qdacChannel object to rename
+            
+            name: New name of the channel
+        """
+        oldName = channel.name
+        #Deletes old entry for name that corresponded to given channel
+        self.channel_mapping[name] = self.channel_mapping.pop(oldName)
+        self._channelNames[channel.number] = name
+        channel._name = name
+        self._snapshot = None
         
         #Send updated name to GUI
-        number = self.channel_mapping[name].number
         #Location is (number, 1) -- 1 is for the column of names
-        loc = [number, 1]
+        loc = [channel.number, 1]
         self.guiDisplay.update_name(loc, name)
-        return
+        for listener in self._nameListeners:
+            listener(oldName, name, channel)
         
         
     def _ramp(self, channels, voltages):
@@ -131,12 +301,162 @@ class qdacWrapper:
             if len(channels) != len(list(voltages)):
                 raise Exception("Different number of channels provided than voltages")
         channels_list = self._convertChannels(channels) #Turns all channels input into array of integers that can be passed to QDAC
-        #with qdac.qdac(self.location) as q:
-        for i in range(len(channels_list)):
-            qdacInst.setDCVoltage(channel=channels_list[i], volts = voltages[i])
-            #self.voltage_list[channels_list[i]-1] = voltages[i]
-            self.voltage_dict[channels_list[i]] = voltages[i]
+        self._rampChannels([self.channel_mapping[self._channelNames[int(n)]] for n in channels_list],
+                           np.array([voltages]).flatten())
         return
+    
+    def _rampChannels(self, channels, voltages):
+        """Ramps several channels of this QDAC together. All channels move
+        towards their targets at the same time and arrive together, where no
+        channel is faster than its slewRate.
+        
+        Short ramps are stepped from Python: all channels take the same number
+        of increments, such that no channel changes by more than its maxStep
+        per increment. The commands of each increment are sent as one batch
+        (see qdac.qdac.batch), and voltage_dict and the GUI are updated once
+        per increment. Ramps taking at least hardwareRampTime are run by the
+        QDAC itself (see _rampAWG).
+        
+        Args:
+            channels: List of qdacChannel objects
+            
+            voltages: List of voltages (in Volts) to ramp each channel to
+        """
+        start = np.array([channel.voltage for channel in channels], dtype=float)
+        end = np.array(voltages, dtype=float)
+        change = np.abs(end - start)
+        if not change.any():
+            return
+        
+        #Time the ramp takes when every channel is limited by its slew rate
+        slewRates = np.array([channel.slewRate or np.inf for channel in channels])
+        duration = np.max(change/slewRates)
+        if self.connected and duration >= self.hardwareRampTime:
+            self._rampAWG(channels, start, end, duration)
+            return
+        
+        increments = self._increments(channels, change)
+        delay = max(self.stepDelay, duration/increments)
+        for n in range(1, increments + 1):
+            if n == increments:
+                values = end
+            else:
+                values = start + (end - start)*n/increments
+            with self._batch():
+                for channel, value in zip(channels, values):
+                    channel._set(value)
+            self._updateVoltages(channels, values)
+            if delay and n < increments:
+                time.sleep(delay)
+        self._journal(channels, end)
+    
+    def _increments(self, channels, change):
+        """Returns the least number of equal increments of a ramp such that no
+        channel changes by more than its maxStep per increment
+        
+        Args:
+            channels: List of qdacChannel objects
+            
+            change: Array of the absolute change in voltage of each channel
+        """
+        maxSteps = np.array([channel.maxStep or self.maxStep for channel in channels])
+        return max(int(np.ceil(np.max(change/maxSteps) - 1e-9)), 1)
+    
+    def _rampAWG(self, channels, start, end, duration):
+        """Runs a ramp of several channels on the QDAC AWG, such that a long
+        ramp takes a few commands instead of one per step. A linear waveform
+        from 0 to 1 is shared by all channels, which each scale it by their
+        change in voltage (amplitude) on top of their start voltage (offset).
+        Every sample is one increment of at most maxStep (see _increments).
+        Ramps longer than the AWG memory are split into segments of the same
+        waveform with shifted offsets. Only the final DC voltage is set from
+        Python.
+        
+        Channels are switched to the AWG with amplitude 0 before it is
+        started, so they output their start voltage whatever sample the AWG
+        holds from before. The waveform holds 0 for awgLead per channel, while
+        the amplitudes are set.
+        
+        If the ramp is interrupted (by an exception such as KeyboardInterrupt
+        or an error reply), the channels hold the start voltage of the
+        segment that was running, which is what the AWG outputs until it
+        reaches that segment's amplitudes.
+        
+        Args:
+            channels: List of qdacChannel objects
+            
+            start: Array of the voltages each channel starts at
+            
+            end: Array of the voltages to ramp each channel to
+            
+            duration: Time in seconds the ramp should take
+        """
+        increments = max(int(np.ceil(duration*self.awgRate)),
+                         self._increments(channels, np.abs(end - start)))
+        lead = int(np.ceil(self.awgLead*len(channels)*self.awgRate))
+        segments = int(np.ceil(increments/(self.awgSamples - lead - 1)))
+        increments = int(np.ceil(increments/segments))
+        waveform = np.concatenate([np.zeros(lead), np.linspace(0, 1, increments + 1)])
+        self.qdacInst.defineAWGraw(waveform, repetitions=1, run=False)
+        
+        step = (end - start)/segments
+        #Voltages held by the channels, the offsets of the running segment
+        reached = start
+        try:
+            for segment in range(segments):
+                offsets = start + step*segment
+                reached = offsets
+                with self._batch():
+                    for channel, offset in zip(channels, offsets):
+                        self.qdacInst.setChannelOutput(channel.number, qdac.Generator.AWG,
+                                                       0, offset)
+                    self.qdacInst.runAWG(1)
+                    for channel, amplitude, offset in zip(channels, step, offsets):
+                        self.qdacInst.setChannelOutput(channel.number, qdac.Generator.AWG,
+                                                       amplitude, offset)
+                time.sleep(len(waveform)/self.awgRate)
+                self._updateVoltages(channels, offsets + step)
+            reached = end
+        finally:
+            #Hold the voltages reached. DC voltages can only be set while the
+            #channel outputs DC.
+            with self._batch():
+                for channel, value in zip(channels, reached):
+                    self.qdacInst.setChannelOutput(channel.number, qdac.Generator.DC)
+                    channel._set(value)
+            self._updateVoltages(channels, reached)
+            self._journal(channels, reached)
+    
+    def _updateVoltages(self, channels, values):
+        """Records and displays the voltages of several channels at once"""
+        self.voltage_dict.update(zip([channel.number for channel in channels], values))
+        self._snapshot = None
+        #Location of gui is (channel #, 2) -- 2 is for column of voltages
+        self.guiDisplay.submit_many([([channel.number, 2], np.round(value, 6))
+                                     for channel, value in zip(channels, values)])
+    
+    def _journal(self, channels, values):
+        """Records the voltages channels were ramped to in the journal"""
+        if self.journal is not None:
+            self.journal.recordMany([(channel.name, value) for channel, value in zip(channels, values)])
+    
+    def _batch(self):
+        """Returns batch context of the QDAC, or a context doing nothing when
+        not connected"""
+        if self.connected:
+            return self.qdacInst.batch()
+        return contextlib.nullcontext()
+    
+    def close(self):
+        """Closes the serial port of the QDAC if it was opened from location"""
+        if self._opened:
+            self.qdacInst.__exit__(None, None, None)
+            self._opened = False
+    
+    @property
+    def connected(self):
+        """Whether commands are sent to an actual (opened) QDAC"""
+        return isinstance(self.qdacInst, qdac.qdac)
         
     def _getChannel(self, name):
         if self._nameExist(name):
@@ -146,9 +466,7 @@ class qdacWrapper:
             raise Exception("No channel with the name %s exists!" % (name,))
             
     def _getName(self, channel):
-        for name in self.channel_mapping:
-            if self.channel_mapping[name].number == channel:
-                return name
+        return self._channelNames.get(channel)
     
     def _nameExist(self, name):
         if type(name) != str:
@@ -158,29 +476,34 @@ class qdacWrapper:
     def _channelExist(self,channel):
         if type(channel) != int:
             raise Exception("Input %s is not an integer!" % (channel,))
-        return channel in self.channel_mapping.values()
+        return channel in self._channelNames
     
     def _convertChannels(self, channels):
         """Convert list of channels (given by name or number) into list of numbers"""
-        if len(channels) ==1:
-            channels = channels[0]
         input_type = type(channels)
         if input_type in {np.ndarray, list, tuple}:
-            return np.append(self._parseChannel(channels[0]), self._convertChannels(channels[1:]))
+            return np.array([self._parseChannel(channel)[0] for channel in channels], dtype=int)
         else:
             return self._parseChannel(channels)
     
     def _parseChannel(self, channel):
         """Parses input such that it returns the channel number given either name or number."""
-        input_type = type(channel)
-        if input_type == str:
-            return np.array([self._getChannel(channel)])
-        elif input_type == int and 1 <= channel <= 48:
+        if isinstance(channel, str):
+            return np.array([self._getChannel(channel).number])
+        elif isinstance(channel, (int, np.integer)) and 1 <= channel <= 48:
             return np.array([channel])
         else:
             raise Exception("Inputs should an existing Channel name or integer between 1 and 48")
         
     def snapshot(self):
+        """Returns DataFrame of the name and voltage of every channel. The
+        same DataFrame is returned until a voltage or name changes, so it
+        should not be modified."""
+        if self._snapshot is None:
+            self._snapshot = self._buildSnapshot()
+        return self._snapshot
+    
+    def _buildSnapshot(self):
         #Convert voltage table to pandas data frame
         #channel_table = {'Channel Number': [], 'Channel Name': [], 'Voltage': []}
         channel_table = {'Channel Name': [], 'Voltage': []}
@@ -1,11 +1,159 @@
 import holoviews as hv
 import numpy as np
+import itertools
+import journal
 from IPython.display import display
 
+def buildPlot(points, sweepNames, measNames, adaptive=False):
+    """Builds the Holoviews plot of a measurement from its raw arrays. Returns
+    a Curve (1D sweep), Image (2D sweep) or Points (adaptive 2D sweep), or a
+    Layout of these if more than one parameter was measured. Sweeps of more
+    than two instruments give a HoloMap of Images of the last two
+    instruments, with a slider for each outer instrument.
+    
+    Args:
+        points: Dictionary of arrays in the same format as the point_dict of
+            PlottingThread, ie {instrumentName: [setpoints], measurementInstName: [measured data]}
+        
+        sweepNames: List of names of the swept instruments, in order of
+            (x-axis, y-axis), or outermost first for more than two
+        
+        measNames: List of names of the measured instruments
+        
+        adaptive: (default=False) If True, the points were measured by an
+            adaptive sweep, in which case 1D setpoints are not in order
+    """
+    plot = None
+    for i, name in enumerate(measNames):
+        element = buildElement(points, sweepNames, name, i, adaptive)
+        plot = element if plot is None else plot + element
+    return plot
+
+def buildElement(points, sweepNames, measName, number=0, adaptive=False):
+    """Builds the Holoviews Curve or Image of a single measured parameter (see
+    buildPlot)
+    
+    Args:
+        measName: Name of the measured instrument to plot
+        
+        number: Position of the parameter among all measured ones. Used to
+            pick the color of a Curve.
+        
+        adaptive: (default=False) If True, the points were measured by an
+            adaptive sweep
+    """
+    if len(sweepNames) > 2:
+        outerNames = sweepNames[:-2]
+        images = {}
+        for outer in itertools.product(*(range(len(points[name])) for name in outerNames)):
+            key = tuple(points[name][i] for name, i in zip(outerNames, outer))
+            images[key] = buildElement(innerSlice(points, sweepNames, [measName], outer),
+                                       sweepNames[-2:], measName, number, adaptive)
+        return hv.HoloMap(images, kdims=outerNames)
+    x_data = points[sweepNames[0]]
+    if len(sweepNames) > 1 and np.ndim(points[measName]) == 1:
+        #Adaptive 2D sweeps measure scattered points instead of a grid, where
+        #unmeasured points are nan
+        y_data = points[sweepNames[1]]
+        measured = ~np.isnan(x_data)
+        return hv.Points((x_data[measured], y_data[measured],
+                          points[measName][measured]),
+                         kdims=[sweepNames[0], sweepNames[1]],
+                         vdims=measName).opts(norm=dict(framewise=True),
+                                              plot=dict(color_index=measName,
+                                                        colorbar=True),
+                                              style=dict(cmap='jet'))
+    if len(sweepNames) > 1:
+        y_data = points[sweepNames[1]]
+        return hv.Image((x_data, y_data, points[measName]),
+                        kdims=[sweepNames[0], sweepNames[1]],
+                        vdims=measName).opts(norm=dict(framewise=True),
+                                             plot=dict(colorbar=True),
+                                             style=dict(cmap='jet'))
+    y_data = points[measName]
+    if adaptive or np.isnan(x_data).any():
+        #Adaptive sweeps measure points out of order, and setpoints that are
+        #not measured yet are nan. Other sweeps are drawn in the order they
+        #were measured, such that sweeps back and forth stay two branches.
+        measured = ~np.isnan(x_data)
+        order = np.argsort(x_data[measured])
+        x_data = x_data[measured][order]
+        y_data = y_data[measured][order]
+    return hv.Curve((x_data, y_data), kdims=sweepNames[0],
+                    vdims=measName).options(framewise=True,
+                                            color=hv.Cycle('Colorblind').values[number])
+
+def innerSlice(points, sweepNames, measNames, outer):
+    """Returns the points of the last two swept instruments, at one setpoint
+    of every outer instrument of a sweep of more than two instruments. The
+    result is a 2D sweep in the format of buildPlot.
+    
+    Args:
+        outer: Tuple of the index into the setpoints of every outer
+            instrument, outermost first
+    """
+    #Measured arrays are indexed in reverse order of the swept instruments,
+    #so the inner two instruments are the first two axes
+    index = (slice(None), slice(None)) + tuple(outer[::-1])
+    inner = {name: points[name] for name in sweepNames[-2:]}
+    for name in measNames:
+        inner[name] = points[name][index]
+    return inner
+
+def plotArrays(plot):
+    """Returns (points, sweepNames, measNames) of a Holoviews plot, in the
+    format of buildPlot. Used for data pickled by older versions, which only
+    stored the plot.
+
+    Args:
+        plot: Curve, Image or Layout of these, as built by older versions
+    """
+    if isinstance(plot, hv.Layout):
+        elements = [element for element in plot.values() if isinstance(element, hv.Element)]
+    else:
+        elements = [plot]
+    points = {}
+    measNames = []
+    for element in elements:
+        sweepNames = [dim.name for dim in element.kdims]
+        measName = element.vdims[0].name
+        if isinstance(element, hv.Image):
+            #Coordinates and array are both returned in ascending order, with
+            #the array indexed as [y, x] like the measured arrays of sweeps
+            points[sweepNames[0]] = element.dimension_values(0, expanded=False)
+            points[sweepNames[1]] = element.dimension_values(1, expanded=False)
+            points[measName] = element.dimension_values(2, flat=False)
+        else:
+            points[sweepNames[0]] = element.dimension_values(0)
+            points[measName] = element.dimension_values(1)
+        measNames.append(measName)
+    return points, sweepNames, measNames
+
 class savedData:
-    def __init__(self, result, metadata, name, description):
-        """Object used to hold resulting plot from a measurement, basic description of measurement, and metadata about system state."""
-        self._plot = result
+    def __init__(self, points, sweepNames, measNames, metadata, name, description,
+                 adaptive=False):
+        """Object used to hold the raw data from a measurement, basic description of measurement, and metadata about system state.
+        The plot is rebuilt from the raw arrays whenever it is requested.
+        
+        Args:
+            points: Dictionary of setpoint and measurement arrays (see buildPlot)
+            
+            sweepNames: List of names of the swept instruments
+            
+            measNames: List of names of the measured instruments
+            
+            metadata: Dictionary of the state of each instrument
+            
+            name: Name of the data, which is also used as the filename
+            
+            description: Short description of the measurement
+            
+            adaptive: (default=False) Whether the data was measured by an
+                adaptive sweep, whose setpoints are not in order
+        """
+        self._points = points
+        self._sweepNames = list(sweepNames)
+        self._measNames = list(measNames)
         self._metadata = metadata
         self.name = name
         
@@ -14,7 +162,37 @@ class savedData:
         
         self.description = description
         self.comment = None
+        self.adaptive = adaptive
+        
+        #ID of the last entry of the setpoint journal when the data was saved
+        #(see journal.py), or None if not known
+        self.journalOffset = None
         return
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        #Data pickled by older versions only stored the Holoviews plot, so
+        #the raw arrays are recovered from it to be able to save it again
+        if '_points' not in state and state.get('_plot') is not None:
+            self._points, self._sweepNames, self._measNames = plotArrays(state['_plot'])
+        self.__dict__.setdefault('journalOffset', None)
+        self.__dict__.setdefault('adaptive', False)
+
+    @property
+    def points(self):
+        """Returns dictionary of the setpoint and measured arrays, keyed by
+        instrument name"""
+        return self._points
+    
+    @property
+    def sweepNames(self):
+        """Returns list of names of the swept instruments"""
+        return self._sweepNames
+    
+    @property
+    def measNames(self):
+        """Returns list of names of the measured instruments"""
+        return self._measNames
     
     @property
     def data(self):
@@ -26,6 +204,20 @@ class savedData:
         """Returns state of all instruments at time of measurement as a dictionary, based off snapshot feature of QCoDeS instruments"""
         return self._metadata
     
+    def journalState(self, filename=journal.JOURNAL_FILE):
+        """Returns the value every instrument was last ramped to when the data
+        was saved, as {name: value}, looked up in the setpoint journal (see
+        journal.py). Returns None for data without a journal offset.
+        
+        Args:
+            filename: (default=journal.JOURNAL_FILE) Journal file, by default
+                the one in the current folder
+        """
+        offset = getattr(self, 'journalOffset', None)
+        if offset is None:
+            return None
+        return journal.Journal(filename).stateAt(offset=offset)
+    
     @property
     def readableState(self):
         """Prints clean and simplified state of all instruments."""
@@ -42,9 +234,14 @@ class savedData:
     @property
     def plot(self):
         """Returns the plot associated with the given measurement. With Holoviews objects this should also display the plot inline"""
-        if type(self._plot) == hv.Image:
-            return self._plot.opts(norm=dict(framewise=True), plot=dict(colorbar=True), style=dict(cmap='jet'))
-        return self._plot
+        #Data pickled by older versions stored the Holoviews object itself
+        legacy_plot = self.__dict__.get('_plot')
+        if legacy_plot is not None:
+            if type(legacy_plot) == hv.Image:
+                return legacy_plot.opts(norm=dict(framewise=True), plot=dict(colorbar=True), style=dict(cmap='jet'))
+            return legacy_plot
+        return buildPlot(self._points, self._sweepNames, self._measNames,
+                         self.adaptive)
     
     def __repr__(self):
         if self.comment:
@@ -0,0 +1,138 @@
+import itertools
+import numpy as np
+
+#Orders in which the points of a sweep are visited. Each order is a generator
+#of (index, lineEnd), where index is a tuple with the index into the setpoints
+#of each swept instrument (in order inst1, inst2) and lineEnd is True for the
+#last point before the slow axis steps. The sweep ramps an instrument only
+#when its index changes, so the order decides how far instruments travel.
+#
+#Sweeps of more than two instruments visit the last two (inner) instruments
+#in the given order for every combination of the outer ones, which are
+#stepped like a raster with the first instrument slowest.
+
+ORDERS = ['raster', 'serpentine', 'columnFirst', 'progressive']
+
+#Coarsest stride of the progressive order, which measures every COARSEST-th
+#point along both axes first, then halves the stride until every point has
+#been measured
+COARSEST = 16
+
+def scanOrder(order, shape):
+    """Returns generator of the points of a sweep in the given order
+
+    Args:
+        order: Name of the order, one of ORDERS:
+            raster: inst2 (fast axis) is stepped through all of its values
+                for each value of inst1, starting over from the first value
+                on every line.
+            serpentine: As raster, but every other line is swept backwards so
+                inst2 does not have to ramp back to the start on every line.
+            columnFirst: Axes are swapped, inst1 is stepped through all of
+                its values for each value of inst2.
+            progressive: Coarse to fine. First every COARSEST-th point along
+                both axes is measured, then the points in between at half
+                the stride and so on, so at any time the measured points
+                cover the full range (see completedStride). Each stride is
+                measured as serpentine lines.
+            For a 1D sweep all orders are the same.
+
+        shape: Tuple of the number of setpoints of each swept instrument
+    """
+    if order not in ORDERS:
+        raise Exception('Unknown scan order %s, use one of %s' % (order, ORDERS))
+    if len(shape) == 1:
+        return ((((i,), i == shape[0] - 1)) for i in range(shape[0]))
+    if len(shape) > 2:
+        return _outer(order, shape)
+    if order == 'columnFirst':
+        return (((i, j), last) for (j, i), last in _lines(shape[::-1], False))
+    if order == 'progressive':
+        return _progressive(shape)
+    return _lines(shape, order == 'serpentine')
+
+def _outer(order, shape):
+    """Repeats the order of the inner two axes for every index of the outer
+    axes"""
+    for outer in itertools.product(*(range(n) for n in shape[:-2])):
+        for inner, lineEnd in scanOrder(order, shape[-2:]):
+            yield outer + inner, lineEnd
+
+def _lines(shape, serpentine):
+    """Steps the second axis fastest, reversing it on every other line for
+    serpentine"""
+    slow, fast = shape
+    for i in range(slow):
+        if serpentine and i % 2:
+            fast_range = range(fast - 1, -1, -1)
+        else:
+            fast_range = range(fast)
+        for n, j in enumerate(fast_range):
+            yield (i, j), n == fast - 1
+
+def _progressive(shape):
+    """Steps through the strides from COARSEST to 1, measuring only the points
+    not measured at a coarser stride"""
+    slow, fast = shape
+    stride = COARSEST
+    while stride > 1 and stride >= max(shape):
+        stride //= 2
+    first = True
+    while stride >= 1:
+        rows = range(0, slow, stride)
+        for n, i in enumerate(rows):
+            columns = range(0, fast, stride)
+            if n % 2:
+                columns = columns[::-1]
+            #Points on an even row and column were measured at a coarser stride
+            columns = [j for j in columns
+                       if first or (i % (2*stride) or j % (2*stride))]
+            for m, j in enumerate(columns):
+                yield (i, j), m == len(columns) - 1
+        stride //= 2
+        first = False
+
+def strideOf(index):
+    """Returns the stride at which the progressive order measures the point at
+    index (tuple of setpoint indices), ie the size of the block of the preview
+    it fills"""
+    stride = COARSEST
+    while stride > 1 and any(i % stride for i in index):
+        stride //= 2
+    return stride
+
+def completedStride(data):
+    """Returns the smallest stride at which every point of a 2D measured
+    array has been measured, or None if not even the coarsest points have
+    been. data[::stride, ::stride] is then a complete map at lower resolution,
+    such as after aborting a progressive sweep.
+
+    Args:
+        data: 2D measured array, where unmeasured points are nan
+    """
+    stride = 1
+    while stride <= COARSEST:
+        if not np.isnan(data[::stride, ::stride]).any():
+            return stride
+        stride *= 2
+    return None
+
+def preview(data):
+    """Returns a copy of a 2D measured array where every unmeasured point is
+    filled in with the value of the closest measured point of a coarser
+    stride above and to the left of it, ie each point measured in a
+    progressive sweep fills the block it is the corner of. Used to show a
+    full range preview of a progressive sweep.
+
+    Args:
+        data: 2D measured array, where unmeasured points are nan
+    """
+    filled = np.array(data, dtype=float)
+    stride = 2
+    while stride <= COARSEST and np.isnan(filled).any():
+        rows = np.arange(data.shape[0]) // stride * stride
+        columns = np.arange(data.shape[1]) // stride * stride
+        coarse = data[np.ix_(rows, columns)]
+        filled = np.where(np.isnan(filled), coarse, filled)
+        stride *= 2
+    return filled
@@ -0,0 +1,140 @@
+import time
+import numpy as np
+
+#Settle policies decide how long to wait after ramping a swept instrument
+#before measuring. A policy is split into start, called right after the ramp,
+#and wait, called right before measuring, so that the sweep can do other work
+#(saving or plotting the previous point) while the instrument settles.
+#
+#An instrument can define its own default policy through a settlePolicy
+#attribute, otherwise DEFAULT is used.
+
+class FixedSettle:
+    """Waits a fixed time after every ramp"""
+    def __init__(self, delay):
+        """
+        Args:
+            delay: Time to wait in seconds
+        """
+        self.delay = delay
+
+    def __repr__(self):
+        return 'FixedSettle(%s)' % (self.delay,)
+
+    def start(self, instrument, previous, value):
+        """Called right after the instrument was ramped. Returns the earliest
+        time (as time.time()) at which the instrument can be settled.
+
+        Args:
+            instrument: Instrument that was ramped
+
+            previous: Value the instrument was at before the ramp, or None if
+                not known
+
+            value: Value the instrument was ramped to
+        """
+        return time.time() + self.delay
+
+    def wait(self, instrument, deadline):
+        """Blocks until the instrument is settled
+
+        Args:
+            instrument: Instrument that was ramped
+
+            deadline: Return value of start
+        """
+        remaining = deadline - time.time()
+        if remaining > 0:
+            time.sleep(remaining)
+
+class StepSettle(FixedSettle):
+    """Waits a time proportional to the size of the step, for example for gates
+    behind an RC filter"""
+    def __init__(self, perUnit, delay=0, maximum=None):
+        """
+        Args:
+            perUnit: Time to wait in seconds per unit (ie V) of the step
+
+            delay: (default=0) Additional fixed time to wait in seconds
+
+            maximum: (Optional) Longest time to wait in seconds. Also used when
+                the size of the step is not known (first point of a sweep).
+        """
+        FixedSettle.__init__(self, delay)
+        self.perUnit = perUnit
+        self.maximum = maximum
+
+    def __repr__(self):
+        return 'StepSettle(%s, %s, %s)' % (self.perUnit, self.delay, self.maximum)
+
+    def start(self, instrument, previous, value):
+        if previous is None:
+            wait = self.maximum if self.maximum is not None else self.delay
+        else:
+            wait = self.delay + self.perUnit*abs(value - previous)
+            if self.maximum is not None:
+                wait = min(wait, self.maximum)
+        return time.time() + wait
+
+class ReadbackSettle(FixedSettle):
+    """Waits until a readback value stops changing, ie until consecutive
+    readings agree within a tolerance"""
+    def __init__(self, readback, tolerance, interval=.05, delay=0, timeout=10):
+        """
+        Args:
+            readback: Function without arguments that returns the value to
+                check, for example the measure method of a lock-in
+
+            tolerance: Largest difference between two consecutive readings for
+                the value to count as settled
+
+            interval: (default=.05) Time in seconds between readings
+
+            delay: (default=0) Minimum time to wait in seconds before the first
+                reading
+
+            timeout: (default=10) Longest time to wait in seconds. The sweep
+                continues (with a warning) if the value has not settled by then.
+        """
+        FixedSettle.__init__(self, delay)
+        self.readback = readback
+        self.tolerance = tolerance
+        self.interval = interval
+        self.timeout = timeout
+
+    def __repr__(self):
+        return 'ReadbackSettle(%s, tolerance=%s)' % (self.readback, self.tolerance)
+
+    def wait(self, instrument, deadline):
+        FixedSettle.wait(self, instrument, deadline)
+        end = time.time() + self.timeout
+        last = self.readback()
+        while True:
+            time.sleep(self.interval)
+            reading = self.readback()
+            if np.all(np.abs(reading - last) <= self.tolerance):
+                return
+            if time.time() > end:
+                print('%s did not settle within %s seconds' % (instrument.name, self.timeout))
+                return
+            last = reading
+
+#Same wait as before settle policies existed
+DEFAULT = FixedSettle(.1)
+
+def policyFor(instrument, policies=None):
+    """Returns the settle policy to use for a swept instrument
+
+    Args:
+        instrument: Swept instrument
+
+        policies: (Optional) Either a single policy for all instruments, or a
+            dictionary of {instrumentName: policy}. Instruments not given
+            use their own settlePolicy attribute or DEFAULT.
+    """
+    if isinstance(policies, dict):
+        if instrument.name in policies:
+            return policies[instrument.name]
+    elif policies is not None:
+        return policies
+    return getattr(instrument, 'settlePolicy', DEFAULT)
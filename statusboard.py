@@ -0,0 +1,200 @@
+import os
+import sys
+import mmap
+import time
+import argparse
+import tempfile
+import threading
+import numpy as np
+
+#Channel status table (name and voltage of each channel) shared with a viewer
+#in a separate process, so displaying it costs the measurement process only a
+#write to shared memory. The table is a memory-mapped file:
+#
+#   magic (8 bytes), seq (uint64), then for each channel:
+#       name (NAME_SIZE bytes, utf-8), voltage (float64)
+#
+#seq works as a seqlock: it is odd while the table is being written, and
+#increases with every update, so a viewer can tell whether its copy is
+#consistent and whether anything changed.
+#
+#Start the viewer with
+#    python statusboard.py [file] [--terminal] [--interval seconds]
+
+MAGIC = b'QDACSTAT'
+NAME_SIZE = 32
+CHANNELS = 48
+DEFAULT_FILE = os.path.join(tempfile.gettempdir(), 'qdac_status')
+
+_ROW = np.dtype([('name', 'S%d' % (NAME_SIZE,)), ('voltage', '<f8')])
+_HEADER_SIZE = 16
+
+def _size(channels):
+    return _HEADER_SIZE + channels*_ROW.itemsize
+
+def _views(buffer, channels):
+    """Returns the seq counter and the table of a mapped file"""
+    seq = np.ndarray((1,), dtype='<u8', buffer=buffer, offset=8)
+    rows = np.ndarray((channels,), dtype=_ROW, buffer=buffer, offset=_HEADER_SIZE)
+    return seq, rows
+
+class StatusPublisher:
+    """Publishes the channel table to shared memory. Has the same interface
+    as gui.GUI, so qdacWrapper can use either one (see its display option).
+    Rows are channel numbers, column 1 is the name and column 2 the voltage.
+    """
+    def __init__(self, filename=DEFAULT_FILE, channels=CHANNELS):
+        """
+        Args:
+            filename: (default=DEFAULT_FILE) File the table is mapped to. The
+                viewer must be given the same file.
+
+            channels: (default=CHANNELS) Number of rows of the table
+        """
+        self.filename = filename
+        size = _size(channels)
+        #Not truncated first, since a viewer may still have it mapped
+        fd = os.open(filename, os.O_RDWR | os.O_CREAT)
+        try:
+            os.ftruncate(fd, size)
+            self._map = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+        self._seq, self._rows = _views(self._map, channels)
+        #Views of each column, faster to write single values to than rows
+        self._names = self._rows['name']
+        self._voltages = self._rows['voltage']
+        self._lock = threading.Lock()
+        self._map[:len(MAGIC)] = MAGIC
+        #Clear values left by an earlier publisher
+        with self._lock:
+            self._seq[0] += self._seq[0] % 2 + 1
+            self._rows[:] = np.zeros(channels, dtype=_ROW)
+            self._seq[0] += 1
+
+    def start(self):
+        """Nothing to start, the viewer runs in its own process"""
+        pass
+
+    def submit_to_tkinter(self, loc, value):
+        self.submit_many([(loc, value)])
+
+    def submit_many(self, updates):
+        """Writes several values at once, which the viewer sees together
+
+        Args:
+            updates: List of (loc, value), where loc is [channel, column]
+        """
+        with self._lock:
+            self._seq[0] += 1
+            for (row, column), value in updates:
+                if column == 1:
+                    self._names[row - 1] = str(value).encode()[:NAME_SIZE]
+                else:
+                    self._voltages[row - 1] = value
+            self._seq[0] += 1
+
+    def update_name(self, loc, name):
+        self.submit_many([(loc, name)])
+
+    def close(self):
+        """Unmaps the table. The file is left for viewers still reading it."""
+        self._seq = self._rows = self._names = self._voltages = None
+        self._map.close()
+
+class NoDisplay:
+    """Display that ignores everything submitted to it, with the same
+    interface as StatusPublisher"""
+    def start(self):
+        pass
+
+    def submit_to_tkinter(self, loc, value):
+        pass
+
+    def submit_many(self, updates):
+        pass
+
+    def update_name(self, loc, name):
+        pass
+
+class StatusReader:
+    """Reads the channel table published by StatusPublisher"""
+    def __init__(self, filename=DEFAULT_FILE):
+        """
+        Args:
+            filename: (default=DEFAULT_FILE) File the table is mapped to
+        """
+        with open(filename, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            self._map = mmap.mmap(file.fileno(), size, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise Exception('%s is not a channel status table' % (filename,))
+        self._seq, self._rows = _views(self._map, (size - _HEADER_SIZE)//_ROW.itemsize)
+
+    def read(self):
+        """Returns (seq, list of (name, voltage) of each channel). seq
+        increases whenever the table changes."""
+        while True:
+            seq = int(self._seq[0])
+            if seq % 2 == 0:
+                rows = self._rows.copy()
+                if int(self._seq[0]) == seq:
+                    return seq, [(row['name'].decode(errors='replace'), float(row['voltage']))
+                                 for row in rows]
+            #Being written, try again
+            time.sleep(0)
+
+    def close(self):
+        self._seq = self._rows = None
+        self._map.close()
+
+def viewTerminal(reader, interval):
+    """Prints the table whenever it changes"""
+    last = None
+    while True:
+        seq, rows = reader.read()
+        if seq != last:
+            lines = ['%-10s %-20s %12s' % ('Channel #', 'Name', 'Voltage')]
+            lines += ['Channel %-2d %-20s %12.6f' % (i, name, voltage)
+                      for i, (name, voltage) in enumerate(rows, 1)]
+            #Clear screen and move to the top before redrawing
+            sys.stdout.write('\033[2J\033[H' + '\n'.join(lines) + '\n')
+            sys.stdout.flush()
+            last = seq
+        time.sleep(interval)
+
+def viewWindow(reader, interval):
+    """Shows the table in the same Tkinter window as gui.GUI. Values are read
+    every interval seconds and handed to the GUI, which only redraws labels
+    that changed."""
+    from gui import GUI
+    window = GUI()
+
+    def poll():
+        last = None
+        while True:
+            seq, rows = reader.read()
+            if seq != last:
+                updates = []
+                for i, (name, voltage) in enumerate(rows, 1):
+                    updates.append(([i, 1], name))
+                    updates.append(([i, 2], np.round(voltage, 6)))
+                window.submit_many(updates)
+                last = seq
+            time.sleep(interval)
+
+    threading.Thread(target=poll, daemon=True).start()
+    #Tkinter runs in the main thread of the viewer
+    window.run()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Shows the channel status published by a qdacWrapper')
+    parser.add_argument('file', nargs='?', default=DEFAULT_FILE, help='Status table file')
+    parser.add_argument('--terminal', action='store_true', help='Print to the terminal instead of a window')
+    parser.add_argument('--interval', type=float, default=.2, help='Time in seconds between reads')
+    args = parser.parse_args()
+    reader = StatusReader(args.file)
+    if args.terminal:
+        viewTerminal(reader, args.interval)
+    else:
+        viewWindow(reader, args.interval)
@@ -0,0 +1,43 @@
+import pickle
+import numpy as np
+import pytest
+
+pytest.importorskip('holoviews')
+import catalog
+import datafile
+import saveClass
+
+def _save(name):
+    data = saveClass.savedData({'x': np.arange(3.), 'm': np.arange(3.)}, ['x'], ['m'],
+                               {}, name, 'good data')
+    datafile.save(data, name + datafile.EXTENSION)
+
+def test_refresh_skips_unreadable_files(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    _save('good')
+    _save('truncated')
+    with open('truncated.h5', 'r+b') as file:
+        file.truncate(len(file.read())//2)
+    with open('garbage.h5', 'wb') as file:
+        file.write(b'not an hdf5 file')
+    with open('garbage.p', 'wb') as file:
+        file.write(b'not a pickle')
+    with open('notdata.p', 'wb') as file:
+        pickle.dump({'date': 'no savedData'}, file)
+
+    catalog.refresh()
+
+    assert [entry[1] for entry in catalog.entries()] == ['good.h5']
+    output = capsys.readouterr().out
+    for name in ['truncated.h5', 'garbage.h5', 'garbage.p', 'notdata.p']:
+        assert name in output
+
+def test_refresh_catalogs_file_once_readable(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with open('late.h5', 'wb') as file:
+        file.write(b'')
+    catalog.refresh()
+    assert catalog.entries() == []
+    _save('late')
+    catalog.refresh()
+    assert [entry[1] for entry in catalog.entries()] == ['late.h5']
@@ -0,0 +1,60 @@
+import h5py
+import numpy as np
+import pytest
+
+pytest.importorskip('holoviews')
+import datafile
+import scanorder
+
+def _stream(order, shape=(5, 4)):
+    """Streams a sweep of two instruments in the given order and returns its
+    points"""
+    points = {'x': np.arange(shape[0], dtype=float),
+              'y': np.arange(shape[1], dtype=float),
+              'm': np.full(shape[::-1], np.nan)}
+    writer = datafile.DataWriter('streamed', points, ['x', 'y'], ['m'], 'test',
+                                 order=order)
+    for (i, j), lineEnd in scanorder.scanOrder(order, shape):
+        index = (j, i)
+        points['m'][index] = 10*i + j
+        writer.mark(index)
+        if lineEnd:
+            writer.lineDone()
+    writer.close()
+    return points
+
+@pytest.mark.parametrize('order, chunks', [('raster', (4, 1)),
+                                           ('columnFirst', (1, 5)),
+                                           ('progressive', (4, 5))])
+def test_chunks_follow_scan_lines(tmp_path, monkeypatch, order, chunks):
+    monkeypatch.chdir(tmp_path)
+    points = _stream(order)
+    with h5py.File('streamed.h5', 'r') as f:
+        assert f['data']['m'].chunks == chunks
+        np.testing.assert_array_equal(f['data']['m'][()], points['m'])
+
+def test_columnFirst_lines_are_written_when_done(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    shape = (5, 4)
+    points = {'x': np.arange(shape[0], dtype=float),
+              'y': np.arange(shape[1], dtype=float),
+              'm': np.full(shape[::-1], np.nan)}
+    writer = datafile.DataWriter('streamed', points, ['x', 'y'], ['m'], 'test',
+                                 order='columnFirst')
+    #First line: x steps through all values at the first y
+    for i in range(shape[0]):
+        points['m'][0, i] = i
+        writer.mark((0, i))
+    writer.lineDone()
+    partial = datafile.load('streamed.h5', lazy=False)
+    np.testing.assert_array_equal(partial.points['m'][0], np.arange(shape[0]))
+    assert np.isnan(partial.points['m'][1:]).all()
+    writer.close()
+
+def test_large_chunks_are_capped(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    points = {'x': np.arange(3.), 'y': np.arange(20000.), 'm': np.full((20000, 3), np.nan)}
+    writer = datafile.DataWriter('streamed', points, ['x', 'y'], ['m'], 'test')
+    writer.close()
+    with h5py.File('streamed.h5', 'r') as f:
+        assert np.prod(f['data']['m'].chunks)*8 <= datafile.CHUNK_BYTES
@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('holoviews')
+import liveplot
+import scanorder
+
+@pytest.mark.parametrize('measured', [1, 40, 300, 1199])
+def test_block_matches_full_preview(measured):
+    shape = (40, 30)
+    points = {'x': np.arange(shape[0], dtype=float),
+              'y': np.arange(shape[1], dtype=float),
+              'm': np.full(shape[::-1], np.nan)}
+    plot = liveplot.LivePlot(points, ['x', 'y'], ['m'], preview=True)
+    order = list(scanorder.scanOrder('progressive', shape))
+    for (i, j), lineEnd in order[:measured]:
+        points['m'][j, i] = 10*i + j
+    full = plot._displayed(['m'])['m']
+    for rows, cols in [(slice(0, 30), slice(0, 40)), (slice(17, 25), slice(3, 33)),
+                       (slice(29, 30), slice(39, 40)), (slice(16, 20), slice(32, 40))]:
+        np.testing.assert_array_equal(plot._block('m', rows, cols), full[rows, cols])
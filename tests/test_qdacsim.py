@@ -0,0 +1,184 @@
+import time
+import threading
+import numpy as np
+import pytest
+
+import qdac
+import qdacsim
+import qdacwrapper
+
+@pytest.fixture
+def sim():
+    with qdacsim.QdacSimulator() as sim:
+        yield sim
+
+class _Trace:
+    """Records the output of a simulated channel from a thread, until the
+    channel is switched back to DC after following a generator"""
+
+    def __init__(self, sim, channel):
+        self.sim = sim
+        self.channel = channel
+        self.voltages = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._record, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self._stop.set()
+        self._thread.join()
+
+    def _record(self):
+        generated = False
+        while not self._stop.is_set():
+            #Read before the output, so a voltage is never recorded after the
+            #switch back to DC
+            voltage = self.sim.voltage(self.channel)
+            generator = self.sim.outputs[self.channel][0]
+            if generator == qdac.Generator.DC and generated:
+                return
+            generated = generated or generator != qdac.Generator.DC
+            self.voltages.append(voltage)
+            #Lets the simulator execute commands on time
+            time.sleep(.0001)
+
+    @property
+    def maxJump(self):
+        return np.max(np.abs(np.diff(self.voltages)))
+
+def _configure(q):
+    q.setDCVoltage(1, .1)
+    q.setDCVoltage(2, -.2)
+    q.defineAWGraw(np.linspace(0, 1, 50), run=False)
+    q.setChannelOutput(3, qdac.Generator.AWG, .5, .1)
+    q.setSyncOutput(1, qdac.Generator.AWG)
+
+def test_batched_commands_match_sequential():
+    states = []
+    for batched in [False, True]:
+        with qdacsim.QdacSimulator(latency=.001) as sim:
+            with qdac.qdac(sim.port) as q:
+                if batched:
+                    with q.batch():
+                        _configure(q)
+                else:
+                    _configure(q)
+                assert q._awgLoaded is not None
+            states.append((list(sim.history), dict(sim.voltages), dict(sim.outputs),
+                           dict(sim.syncOutputs), list(sim._awgPending)))
+    assert states[0] == states[1]
+
+def test_awg_upload_is_cached(sim):
+    with qdac.qdac(sim.port) as q:
+        q.defineAWGraw(np.linspace(0, 1, 100), run=False)
+        sent = len(sim.history)
+        q.defineAWGraw(np.linspace(0, 1, 100), run=False)
+        assert len(sim.history) == sent
+        q.defineAWGraw(np.linspace(1, 0, 100), run=False)
+        assert len(sim.history) > sent
+
+def test_failed_batch_does_not_cache_awg_upload(sim):
+    with qdac.qdac(sim.port) as q:
+        with pytest.raises(Exception, match='Error'):
+            with q.batch():
+                q.defineAWGraw(np.linspace(0, 1, 100), run=False)
+                q._sendReceive('bogus 1')
+        assert q._awgLoaded is None
+        sent = len(sim.history)
+        q.defineAWGraw(np.linspace(0, 1, 100), run=False)
+        assert len(sim.history) > sent
+
+def test_dc_output_after_awg(sim):
+    with qdac.qdac(sim.port) as q:
+        q.setDCVoltage(1, .1)
+        q.defineAWGraw([.5], repetitions=1, run=True)
+        q.setChannelOutput(1, qdac.Generator.AWG)
+        assert sim.voltage(1) == pytest.approx(.5)
+        #Switching back outputs the DC voltage set before
+        q.setChannelOutput(1, qdac.Generator.DC)
+        assert sim.voltage(1) == pytest.approx(.1)
+
+def test_get_dc_voltage(sim):
+    sim.voltages[3] = .25
+    with qdac.qdac(sim.port) as q:
+        assert q.getDCVoltage(3) == pytest.approx(.25)
+        q.setDCVoltage(4, -.5)
+        assert q.getDCVoltages([3, 4, 5]) == pytest.approx([.25, -.5, 0])
+
+def test_wrapper_reads_voltages_when_connecting(sim):
+    sim.voltages[2] = .3
+    wrapper = qdacwrapper.qdacWrapper(location=sim.port, display=None)
+    try:
+        channel = wrapper.channel_mapping['qdac2']
+        assert channel.voltage == pytest.approx(.3)
+        assert wrapper.voltage_dict[2] == pytest.approx(.3)
+        assert wrapper.voltage_dict[1] == 0
+    finally:
+        wrapper.close()
+
+def test_interrupted_awg_ramp_holds_reached_voltage(sim, monkeypatch):
+    wrapper = qdacwrapper.qdacWrapper(location=sim.port, display=None)
+    try:
+        #Ramp of 0.3 V in 9 segments of 1/30 V
+        wrapper.awgSamples = 40
+        channel = wrapper.channel_mapping['qdac1']
+        channel.slewRate = 1
+        update = wrapper._updateVoltages
+        calls = []
+        def interrupt(channels, values):
+            calls.append(values)
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            update(channels, values)
+        monkeypatch.setattr(wrapper, '_updateVoltages', interrupt)
+        with pytest.raises(KeyboardInterrupt):
+            channel.ramp(.3)
+        assert sim.outputs[1][0] == qdac.Generator.DC
+        assert sim.voltage(1) == pytest.approx(.3/9, abs=1e-6)
+        assert channel.voltage == pytest.approx(.3/9)
+        assert calls[-1] == pytest.approx([.3/9])
+    finally:
+        wrapper.close()
+
+@pytest.fixture
+def slowSim():
+    #Commands take long enough to record the output in between them
+    with qdacsim.QdacSimulator(commandTime=.002) as sim:
+        yield sim
+
+@pytest.fixture
+def wrapper(slowSim):
+    wrapper = qdacwrapper.qdacWrapper(location=slowSim.port, display=None)
+    yield wrapper
+    wrapper.close()
+
+def test_awg_ramp_does_not_jump(slowSim, wrapper):
+    channel = wrapper.channel_mapping['qdac1']
+    channel.slewRate = 1
+    #The first ramp leaves the AWG holding the last sample of its waveform
+    channel.ramp(.3)
+    assert slowSim.awgSample() == pytest.approx(1)
+    with _Trace(slowSim, 1) as trace:
+        channel.ramp(0)
+    assert trace.voltages[0] == pytest.approx(.3, abs=1e-6)
+    assert trace.maxJump <= wrapper.maxStep
+    assert slowSim.outputs[1][0] == qdac.Generator.DC
+    assert slowSim.voltage(1) == pytest.approx(0, abs=1e-6)
+    assert channel.voltage == 0
+
+def test_buffered_line(slowSim, wrapper):
+    channel = wrapper.channel_mapping['qdac1']
+    channel.ramp(.2)
+    #AWG holding a sample far from the start of the line
+    wrapper.qdacInst.defineAWGraw([-.7], repetitions=1, run=True)
+    setpoints = np.linspace(.2, .3, 101)
+    with _Trace(slowSim, 1) as trace:
+        channel.bufferedLine(setpoints, .002)
+    assert trace.voltages[0] == pytest.approx(.2, abs=1e-6)
+    assert trace.maxJump <= wrapper.maxStep
+    assert slowSim.outputs[1][0] == qdac.Generator.DC
+    assert slowSim.voltage(1) == pytest.approx(.3, abs=1e-6)
+    assert channel.voltage == pytest.approx(.3)
@@ -0,0 +1,188 @@
+import os
+import struct
+import zlib
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+#Thumbnails are rendered directly from the data arrays with numpy, instead of
+#exporting the Holoviews plot through Bokeh (which needs selenium/phantomjs and
+#takes seconds). This module deliberately only depends on numpy so that the
+#worker processes start quickly.
+
+THUMBNAIL_FOLDER = './DataThumbnails'
+
+#Size in pixels of the thumbnail of a 1D sweep. 2D sweeps are rendered at the
+#resolution of the data, up to MAX_SIZE points along each axis
+SIZE = 100
+MAX_SIZE = 200
+
+#Same colors as hv.Cycle('Colorblind') used for the plots of 1D sweeps
+COLORS = [(0, 114, 178), (213, 94, 0), (0, 158, 115), (204, 121, 167),
+          (86, 180, 233), (230, 159, 0), (240, 228, 66), (0, 0, 0)]
+
+_pool = None
+
+def thumbnailFile(name):
+    """Returns the thumbnail filename of the data with the given name"""
+    return os.path.join(THUMBNAIL_FOLDER, name + '.png')
+
+def renderAsync(savedData):
+    """Renders the thumbnail of a savedData object in a background process.
+    Returns a concurrent.futures.Future whose result is the thumbnail filename.
+
+    Args:
+        savedData: savedData object to make a thumbnail of
+    """
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=1)
+    setpoints = [np.asarray(savedData.points[name]) for name in savedData.sweepNames]
+    measured = [np.asarray(savedData.points[name]) for name in savedData.measNames]
+    return _pool.submit(render, thumbnailFile(savedData.name), setpoints, measured)
+
+def render(filename, setpoints, measured):
+    """Renders a thumbnail of the measured arrays next to each other and saves
+    it as PNG. Returns the filename.
+
+    Args:
+        filename: Name of the png file to write
+
+        setpoints: List of setpoint arrays of each swept instrument
+
+        measured: List of measured arrays of each measurement instrument
+    """
+    if len(setpoints) > 1 and np.ndim(measured[0]) == 1:
+        panels = [_renderImage(*_binScattered(setpoints[0], setpoints[1], data))
+                  for data in measured]
+    elif len(setpoints) > 1:
+        panels = [_renderImage(setpoints[-2], setpoints[-1], _lastImage(data))
+                  for data in measured]
+    else:
+        panels = [_renderCurve(setpoints[0], data, COLORS[i % len(COLORS)])
+                  for i, data in enumerate(measured)]
+
+    #Put panels next to each other, separated by a white column
+    height = max(panel.shape[0] for panel in panels)
+    row = []
+    for panel in panels:
+        padded = np.full((height, panel.shape[1] + 1, 3), 255, dtype=np.uint8)
+        padded[:panel.shape[0], :panel.shape[1]] = panel
+        row.append(padded)
+
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    _writePNG(filename, np.hstack(row)[:, :-1])
+    return filename
+
+def _lastImage(data):
+    """Returns the last image of the inner two swept instruments with any
+    measured points, for sweeps of more than two instruments"""
+    if data.ndim == 2:
+        return data
+    #Outer axes are last and in reverse order, so put them in measuring order
+    images = data.transpose((0, 1) + tuple(range(data.ndim - 1, 1, -1)))
+    images = images.reshape(data.shape[:2] + (-1,))
+    measured = np.flatnonzero(~np.isnan(images).all(axis=(0, 1)))
+    return images[:, :, measured[-1] if len(measured) else 0]
+
+def _binScattered(x_data, y_data, data):
+    """Bins the scattered points of an adaptive 2D sweep onto a grid, averaging
+    points in the same bin. The grid has about one bin per point (at most
+    SIZE by SIZE) so it is mostly filled. Returns (x, y, data) of the grid
+    like a regular 2D sweep, where empty bins are nan."""
+    measured = ~np.isnan(x_data) & ~np.isnan(y_data)
+    x_data, y_data, data = x_data[measured], y_data[measured], data[measured]
+    size = int(np.clip(np.sqrt(len(data)), 2, SIZE))
+    grids = []
+    bins = []
+    for setpoints in (x_data, y_data):
+        grid = np.linspace(np.min(setpoints), np.max(setpoints), size)
+        width = grid[-1] - grid[0] or 1
+        grids.append(grid)
+        bins.append(np.rint((setpoints - grid[0])/width*(size - 1)).astype(int))
+    valid = ~np.isnan(data)
+    total = np.zeros((size, size))
+    count = np.zeros((size, size))
+    np.add.at(total, (bins[1][valid], bins[0][valid]), data[valid])
+    np.add.at(count, (bins[1][valid], bins[0][valid]), 1)
+    with np.errstate(invalid='ignore'):
+        return grids[0], grids[1], total/count
+
+def _renderImage(x_data, y_data, data):
+    """Renders 2D data with the jet colormap. Returns RGB array"""
+    #Data is indexed as [y, x], but the top row of the picture is largest y
+    if len(y_data) < 2 or y_data[0] < y_data[-1]:
+        data = data[::-1]
+    if len(x_data) > 1 and x_data[0] > x_data[-1]:
+        data = data[:, ::-1]
+
+    #Only downsample, the browser scales the picture up
+    ystep = -(-data.shape[0] // MAX_SIZE)
+    xstep = -(-data.shape[1] // MAX_SIZE)
+    data = data[::ystep, ::xstep]
+
+    rgb = np.full(data.shape + (3,), 255, dtype=np.uint8)
+    valid = ~np.isnan(data)
+    if valid.any():
+        low = data[valid].min()
+        high = data[valid].max()
+        t = (data[valid] - low)/(high - low) if high > low else np.full(valid.sum(), .5)
+        rgb[valid] = _jet(t)
+    return rgb
+
+def _renderCurve(x_data, data, color):
+    """Renders 1D data as a line on a white background. Returns RGB array"""
+    rgb = np.full((SIZE, SIZE, 3), 255, dtype=np.uint8)
+    valid = ~np.isnan(data)
+    if not valid.any():
+        return rgb
+    x = x_data[valid]
+    y = data[valid]
+    order = np.argsort(x)
+    x = x[order]
+    y = y[order]
+
+    #Pixel coordinates of the curve, evaluated in every pixel column
+    xspan = x[-1] - x[0]
+    yspan = y.max() - y.min()
+    cols = np.arange(SIZE)
+    if xspan > 0:
+        rows = np.interp(x[0] + cols*xspan/(SIZE - 1), x, y)
+    else:
+        rows = np.full(SIZE, y[0])
+    if yspan > 0:
+        rows = (SIZE - 1)*(y.max() - rows)/yspan
+    else:
+        rows = np.full(SIZE, (SIZE - 1)/2)
+    rows = np.round(rows).astype(int)
+
+    #Fill the vertical gap between neighbouring columns such that steep
+    #parts of the curve are connected
+    low = np.minimum(rows, np.append(rows[1:], rows[-1]))
+    high = np.maximum(rows, np.append(rows[1:], rows[-1]))
+    grid = np.arange(SIZE)[:, None]
+    mask = (grid >= low) & (grid <= high)
+    rgb[mask] = color
+    return rgb
+
+def _jet(t):
+    """Jet colormap of values between 0 and 1. Returns RGB array"""
+    t = t[..., None]
+    centers = np.array([3, 2, 1])
+    return (255*np.clip(1.5 - np.abs(4*t - centers), 0, 1)).astype(np.uint8)
+
+def _writePNG(filename, rgb):
+    """Writes RGB array as PNG file"""
+    height, width, _ = rgb.shape
+    #Each row starts with the filter type, 0 for no filter
+    raw = np.hstack([np.zeros((height, 1), dtype=np.uint8),
+                     rgb.reshape(height, width*3)]).tobytes()
+
+    def chunk(tag, data):
+        return (struct.pack('>I', len(data)) + tag + data +
+                struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff))
+
+    with open(filename, 'wb') as file:
+        file.write(b'\x89PNG\r\n\x1a\n')
+        file.write(chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)))
+        file.write(chunk(b'IDAT', zlib.compress(raw)))
+        file.write(chunk(b'IEND', b''))